@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+import numpy as np
+
+# Limits; each can be overridden from the environment
+MAX_BODY_BYTES = int(os.environ.get("DEADLOCK_MAX_BODY_BYTES", 256 * 1024 * 1024))
+# Estimated cost (see estimate_cost) above which a request runs as a job instead
+MAX_SYNC_COST = int(os.environ.get("DEADLOCK_MAX_SYNC_COST", 20_000_000))
+# Estimated cost above which a request is refused outright (413)
+MAX_COST = int(os.environ.get("DEADLOCK_MAX_COST", 2_000_000_000))
+# Queued jobs above which new jobs are refused (429)
+MAX_QUEUED_JOBS = int(os.environ.get("DEADLOCK_MAX_QUEUED_JOBS", 100))
+# Seconds a synchronous request / a job may compute before it is stopped
+TIME_BUDGET = float(os.environ.get("DEADLOCK_TIME_BUDGET", 10))
+JOB_TIME_BUDGET = float(os.environ.get("DEADLOCK_JOB_TIME_BUDGET", 600))
+# Simulations whose history would hold more values than this (summed over
+# all recorded steps, see history_size) are run without history
+HISTORY_MAX_ENTRIES = int(os.environ.get("DEADLOCK_HISTORY_MAX_ENTRIES", 1_000_000))
+
+# Seconds clients are asked to wait after a 429
+RETRY_AFTER = 30
+
+
+class Rejected(Exception):
+    """A request refused by admission control, with the HTTP status to answer with."""
+
+    def __init__(self, status_code, detail, headers=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+def estimate_cost(engine, allocation, request):
+    """
+    Estimates the work a detection engine does on an input, in rough
+    elementary operations.
+
+    The matrix engine makes a few vectorized passes over the matrices, so
+    its cost is the number of cells. The WFG engine also builds one RAG
+    edge per non-zero cell and, converting the RAG, visits every
+    (requester, holder) pair of each resource, which grows quadratically
+    with the processes sharing a resource. Recording history adds the
+    values it stores (see history_size), unless it would be skipped.
+
+    Args:
+        engine: "matrix" or "wfg"
+        allocation: Matrix of current resource allocation to processes
+        request: Matrix of resource requests from processes
+
+    Returns:
+        int: Estimated cost
+    """
+    cells = int(allocation.size)
+    if engine == "wfg":
+        holders = np.count_nonzero(allocation, axis=0).astype(np.int64)
+        requesters = np.count_nonzero(request, axis=0).astype(np.int64)
+        cost = cells + int(holders.sum() + requesters.sum()) + int(holders @ requesters)
+    else:
+        cost = cells
+    size = history_size(engine, allocation, request)
+    if size <= HISTORY_MAX_ENTRIES:
+        cost += size
+    return cost
+
+
+def history_size(engine, allocation, request):
+    """
+    Upper bound on the values the engine records as history for this input.
+
+    Every step holds a snapshot: the WFG engine snapshots the RAG after each
+    request edge, so its history grows with requests x edges; the matrix
+    engine records the matrices once, then work and finish per process.
+    """
+    if engine == "wfg":
+        allocated = int(np.count_nonzero(allocation))
+        requested = int(np.count_nonzero(request))
+        holders = np.count_nonzero(allocation, axis=0).astype(np.int64)
+        requesters = np.count_nonzero(request, axis=0).astype(np.int64)
+        # Initial RAG and one per request edge, then the WFG twice (converted, cycle check)
+        return (requested + 1) * (allocated + requested) + 2 * int(holders @ requesters)
+    n, m = allocation.shape
+    # Initial state, one step per finished process, the final check
+    return 2 * n * m + (n + 2) * (n + m)
+
+
+def keep_history(engine, allocation, request):
+    """
+    Whether to record step-by-step history. It grows with the number of steps
+    times the size of each snapshot, so it is skipped for large inputs.
+    """
+    return history_size(engine, allocation, request) <= HISTORY_MAX_ENTRIES
+
+
+def check_body_size(length):
+    """Raises Rejected (413) if a request body of ``length`` bytes is over MAX_BODY_BYTES."""
+    if length > MAX_BODY_BYTES:
+        stats.record("rejected_too_large")
+        raise Rejected(413, f"Request body of {length:,} bytes exceeds the limit of {MAX_BODY_BYTES:,}")
+
+
+def check_cost(cost):
+    """Raises Rejected (413) if an estimated cost is over MAX_COST."""
+    if cost > MAX_COST:
+        stats.record("rejected_too_large")
+        raise Rejected(413, f"Estimated cost {cost:,} exceeds the limit of {MAX_COST:,}")
+
+
+def admit_job(queued_jobs):
+    """Raises Rejected (429) if the job queue already holds MAX_QUEUED_JOBS jobs."""
+    if queued_jobs >= MAX_QUEUED_JOBS:
+        stats.record("rejected_busy")
+        raise Rejected(
+            429, f"Job queue is full ({queued_jobs} queued), try again later",
+            headers={"Retry-After": str(RETRY_AFTER)}
+        )
+
+
+def admit(cost, queued_jobs):
+    """
+    Decides how a detection request runs.
+
+    Args:
+        cost: Estimated cost from estimate_cost
+        queued_jobs: Callable returning the number of queued jobs; only
+            called when the request would be queued
+
+    Returns:
+        str: "sync" to answer in the request, "job" to queue it
+
+    Raises:
+        Rejected: 413 if it is too large to run at all, 429 if it needs the
+            job queue and the queue is full
+    """
+    check_cost(cost)
+    if cost <= MAX_SYNC_COST:
+        stats.record("accepted")
+        return "sync"
+    admit_job(queued_jobs())
+    stats.record("routed_to_jobs")
+    return "job"
+
+
+def deadline(budget=None):
+    """Monotonic time by which a computation must finish (TIME_BUDGET seconds by default)."""
+    return time.monotonic() + (TIME_BUDGET if budget is None else budget)
+
+
+def check_deadline(deadline):
+    """Raises TimeoutError once ``deadline`` (from deadline(), or None for no limit) has passed."""
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError("Time budget exceeded")
+
+
+class AdmissionStats:
+    """Thread-safe counters of admission decisions, per server process."""
+
+    COUNTERS = (
+        "accepted", "routed_to_jobs", "rejected_too_large", "rejected_busy", "timed_out", "history_skipped"
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def record(self, counter):
+        with self.lock:
+            self.counts[counter] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+stats = AdmissionStats()
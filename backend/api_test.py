@@ -7,6 +7,7 @@ import gym
 import unittest
 from fastapi.testclient import TestClient
 import sys
+import time
 import os
 import json
 from pathlib import Path
@@ -18,6 +19,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 from main import app
 
 from env import DeadlockRecoveryEnv
+from binary_input import dump_raw
 
 app = FastAPI()
 
@@ -88,17 +90,6 @@ def deadlock_recovery(matrix_input: MatrixInput):
 # Create a test client
 client = TestClient(app)
 
-@pytest.fixture(autouse=True)
-def setup_test_files():
-    """Setup function that runs before each test"""
-    # Create empty simulation files if they don't exist
-    if not os.path.exists("matrix_simulations.json"):
-        with open("matrix_simulations.json", "w") as f:
-            json.dump([], f)
-    if not os.path.exists("deadlock_simulations.json"):
-        with open("deadlock_simulations.json", "w") as f:
-            json.dump([], f)
-
 @pytest.mark.asyncio
 async def test_root(client):
     response = client.get("/")
@@ -122,6 +113,41 @@ async def test_matrix_simulation(client):
     assert "deadlocked" in result
     assert "simulation" in result
 
+@pytest.mark.asyncio
+async def test_matrix_simulation_safety_report(client):
+    safe = client.post("/api/matrix", json={
+        "allocation": [[0, 1], [2, 0]],
+        "request": [[2, 0], [0, 1]],
+        "available": [1, 1]
+    }).json()
+    assert safe["deadlocked"] is False
+    assert safe["safe_sequence"] == [1, 0]
+    assert safe["blocked"] == []
+    assert safe["extra_available"] == [0, 0]
+
+    stuck = client.post("/api/matrix", json={
+        "allocation": [[1, 0], [0, 1], [0, 0]],
+        "request": [[0, 1], [1, 0], [0, 0]],
+        "available": [0, 0]
+    }).json()
+    assert stuck["deadlocked"] is True
+    assert stuck["safe_sequence"] == [2]
+    assert stuck["blocked"] == [
+        {"process": 0, "shortfall": [0, 1]},
+        {"process": 1, "shortfall": [1, 0]}
+    ]
+    # Topping up P0 by one unit of R1 lets it finish and release R0 for P1
+    assert stuck["extra_available"] == [0, 1]
+    assert stuck["extra_available_exact"] is True
+
+    # Topping up the smallest shortfall first would ask for [3, 1, 1]
+    tight = client.post("/api/matrix", json={
+        "allocation": [[2, 2, 2], [0, 1, 1]],
+        "request": [[3, 1, 1], [1, 1, 2]],
+        "available": [0, 0, 1]
+    }).json()
+    assert tight["extra_available"] == [3, 1, 0]
+
 @pytest.mark.asyncio
 async def test_wfg_simulation(client):
     test_input = {
@@ -181,5 +207,512 @@ async def test_deadlock_recovery(client):
     assert "steps" in result
     assert len(result["steps"]) > 0
 
+@pytest.mark.asyncio
+async def test_openapi_documents_request_bodies(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    for path in ("/api/matrix", "/api/wfg", "/api/deadlock_recovery", "/api/deadlock_recovery_wsg"):
+        schema = paths[path]["post"]["requestBody"]["content"]["application/json"]["schema"]
+        assert schema["required"] == ["available", "allocation", "request"]
+    assert "application/x-npz" in paths["/api/matrix/binary"]["post"]["requestBody"]["content"]
+    assert "kind" in paths["/api/jobs"]["post"]["requestBody"]["content"]["application/json"]["schema"]["required"]
+
+@pytest.mark.asyncio
+async def test_matrix_simulation_rejects_invalid_input(client):
+    for bad_input in (
+        {"allocation": [[0, 1], [2]], "request": [[2, 0], [0, 1]], "available": [1, 1]},
+        {"allocation": [[0, -1], [2, 0]], "request": [[2, 0], [0, 1]], "available": [1, 1]},
+        {"allocation": [[0, 1], [2, 0]], "request": [[2, 0], [0, 1]]}
+    ):
+        response = client.post("/api/matrix", json=bad_input)
+        assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_deadlock_recovery_reuses_memoized_states(client):
+    from main import rollout_memo
+    rollout_memo.clear()
+    test_input = {
+        "allocation": [[1, 0], [0, 1], [1, 1]],
+        "request": [[0, 1], [1, 0], [1, 0]],
+        "available": [0, 0]
+    }
+
+    first = client.post("/api/deadlock_recovery_wsg", json=test_input)
+    misses = rollout_memo.stats()["misses"]
+    second = client.post("/api/deadlock_recovery_wsg", json=test_input)
+    assert first.status_code == 200 and second.status_code == 200
+
+    # The second rollout starts from a state the first one already visited
+    stats = client.get("/api/metrics").json()["rollout_memo"]
+    assert stats["misses"] == misses
+    assert stats["hits"] > 0
+
+    # Memoized rollouts are deterministic: a cold memo gives the same answer
+    rollout_memo.clear()
+    third = client.post("/api/deadlock_recovery_wsg", json=test_input)
+    assert third.json()["steps"] == first.json()["steps"] == second.json()["steps"]
+
+@pytest.mark.asyncio
+async def test_deadlock_recovery_optimal_strategy(client):
+    test_input = {
+        "allocation": [[1, 0], [0, 1], [1, 1]],
+        "request": [[0, 1], [1, 0], [1, 0]],
+        "available": [0, 0]
+    }
+    response = client.post("/api/deadlock_recovery_wsg?strategy=optimal", json=test_input)
+    assert response.status_code == 200
+    result = response.json()
+    # Preempting P2 alone frees enough for everyone
+    assert result["penalty"] == 5
+    assert result["steps"][-1]["result"] == "No Deadlock"
+
+    too_large = {"allocation": [[1]] * 11, "request": [[1]] * 11, "available": [0]}
+    assert client.post("/api/deadlock_recovery?strategy=optimal", json=too_large).status_code == 413
+    assert client.post("/api/deadlock_recovery?strategy=greedy", json=test_input).status_code == 422
+
+def test_safety_sweep_matches_nested_loop(monkeypatch):
+    import matrix
+
+    def nested_loop(available, allocation, request):
+        work = available.copy()
+        finish = [False] * len(allocation)
+        sequence = []
+        progress = True
+        while progress:
+            progress = False
+            for i in range(len(allocation)):
+                if not finish[i] and (request[i] <= work).all():
+                    work += allocation[i]
+                    finish[i] = True
+                    sequence.append(i)
+                    progress = True
+        return sequence
+
+    # Small windows split the rows, and a release inside a window often lets
+    # an earlier waiting process run, which restarts the window early
+    for window in (1, 2, 3, 2048):
+        monkeypatch.setattr(matrix, "SWEEP_WINDOW", window)
+        rng = np.random.default_rng(window)
+        for _ in range(300):
+            n, m = rng.integers(1, 13), rng.integers(1, 4)
+            allocation = rng.integers(0, 3, (n, m))
+            request = rng.integers(0, 4, (n, m))
+            available = rng.integers(0, 4, m)
+            report = matrix.analyze_safety(available, allocation, request, save_history=False)
+            assert report["safe_sequence"] == nested_loop(available, allocation, request)
+
+def test_extra_available_is_minimal():
+    import itertools
+    from matrix import analyze_safety, is_deadlocked
+
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        n, m = rng.integers(1, 6), rng.integers(1, 4)
+        allocation = rng.integers(0, 3, (n, m))
+        request = rng.integers(0, 4, (n, m))
+        available = rng.integers(0, 2, m)
+        report = analyze_safety(available, allocation, request, save_history=False)
+        # Adding the largest request of each resource always makes the state safe
+        smallest = min(
+            sum(extra) for extra in itertools.product(*(range(top + 1) for top in request.max(axis=0)))
+            if not is_deadlocked(available + np.array(extra), allocation, request, save_history=False)
+        )
+        assert report["extra_available_exact"]
+        assert sum(report["extra_available"]) == smallest
+        assert not is_deadlocked(available + report["extra_available"], allocation, request, save_history=False)
+
+def test_optimal_solver_matches_exhaustive_search():
+    import itertools
+    from recovery_solver import solve_optimal, _apply, _deadlocked, KILL_PENALTY, PREEMPT_PENALTY
+
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        allocation = rng.integers(0, 3, (4, 2))
+        request = rng.integers(0, 3, (4, 2))
+        available = rng.integers(0, 2, 2)
+        best = min(
+            KILL_PENALTY * status.count(2) + PREEMPT_PENALTY * status.count(1)
+            for status in itertools.product(range(3), repeat=4)
+            if not _deadlocked(*_apply(np.array(status), allocation, request, available))
+            and all(allocation[i].any() for i in range(4) if status[i] == 1)
+        )
+        assert solve_optimal(allocation, request, available)["penalty"] == best
+
+@pytest.mark.asyncio
+async def test_admission_control(client, monkeypatch):
+    import admission
+    test_input = {
+        "allocation": [[0, 1], [2, 0]],
+        "request": [[2, 0], [0, 1]],
+        "available": [1, 1]
+    }
+    before = client.get("/api/metrics").json()["admission"]
+
+    # Over the synchronous limit: queued as a job
+    monkeypatch.setattr(admission, "MAX_SYNC_COST", 1)
+    response = client.post("/api/matrix", json=test_input)
+    assert response.status_code == 202
+    job = client.get(response.headers["location"], params={"wait": 10}).json()
+    assert job["status"] == "done" and job["result"]["deadlocked"] is False
+
+    # ... unless the queue is full
+    monkeypatch.setattr(admission, "MAX_QUEUED_JOBS", 0)
+    response = client.post("/api/wfg", json=test_input)
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
+
+    # Over the hard limit: refused
+    monkeypatch.setattr(admission, "MAX_COST", 1)
+    assert client.post("/api/matrix", json=test_input).status_code == 413
+
+    # Out of time, and history skipped for inputs that would record too many steps
+    monkeypatch.setattr(admission, "MAX_COST", 10 ** 9)
+    monkeypatch.setattr(admission, "MAX_SYNC_COST", 10 ** 9)
+    monkeypatch.setattr(admission, "TIME_BUDGET", -1)
+    assert client.post("/api/matrix", json=test_input).status_code == 503
+    monkeypatch.setattr(admission, "TIME_BUDGET", 10)
+    monkeypatch.setattr(admission, "HISTORY_MAX_ENTRIES", 2)
+    response = client.post("/api/wfg", json=test_input)
+    assert response.status_code == 200 and response.json()["simulation"] is None
+
+    after = client.get("/api/metrics").json()["admission"]
+    for counter in ("routed_to_jobs", "rejected_busy", "rejected_too_large", "timed_out", "history_skipped"):
+        assert after[counter] == before[counter] + 1
+
+    # Few steps, but every step snapshots a large graph
+    monkeypatch.setattr(admission, "HISTORY_MAX_ENTRIES", 1_000_000)
+    allocation = np.ones((2000, 20), dtype=np.int64)
+    request = np.zeros((2000, 20), dtype=np.int64)
+    request[:45] = 1
+    assert not admission.keep_history("wfg", allocation, request)
+    request[5:] = 0
+    assert admission.keep_history("wfg", allocation[:200], request[:200])
+
+@pytest.mark.asyncio
+async def test_body_limit_without_content_length(client, monkeypatch):
+    import admission
+    monkeypatch.setattr(admission, "MAX_BODY_BYTES", 10)
+    # A generator body is sent chunked, with no Content-Length to refuse it up front
+    response = client.post(
+        "/api/matrix/binary", content=(chunk for chunk in [b"\0" * 8, b"\0" * 8]),
+        headers={"content-type": "application/octet-stream"}
+    )
+    assert response.status_code == 413
+
+def test_wfg_handles_long_wait_chains():
+    from rag_wfg import detect_wfg
+
+    # P0 waits for P1, which waits for P2, ... far deeper than the recursion limit
+    n = 5000
+    allocation = np.eye(n, dtype=np.int64)
+    request = np.roll(np.eye(n, dtype=np.int64), 1, axis=1)
+    request[-1] = 0
+    available = np.zeros(n, dtype=np.int64)
+    assert detect_wfg(available, allocation, request, save_history=False)["deadlocked"] is False
+
+    request[-1, 0] = 1
+    result = detect_wfg(available, allocation, request, save_history=False)
+    assert result["deadlocked"] is True and len(result["cycle_nodes"]) == n
+
+def test_numpy_policy_matches_sb3_predict():
+    from lean_policy import NumpyPolicy
+
+    rng = np.random.default_rng(0)
+    for model_path in ("ppo_deadlock_multi_env.zip", "ppo_deadlock_recovery_single.zip"):
+        sb3 = PPO.load(model_path)
+        lean = NumpyPolicy.load(model_path)
+        obs = rng.integers(0, 11, (2000,) + sb3.observation_space.shape).astype(np.int32)
+        expected, _ = sb3.predict(obs, deterministic=True)
+        actions, _ = lean.predict(obs, deterministic=True)
+        assert (actions == expected).all()
+        assert lean.predict(obs[0], deterministic=True)[0] == expected[0]
+
+def reference_step(single, allocation, request, available, action):
+    """One step of the original loop-based recovery envs, on plain arrays."""
+    n = len(allocation)
+    work, finish, changed = available.copy(), [False] * n, True
+    while changed:
+        changed = False
+        for i in range(n):
+            if not finish[i] and all(request[i] <= work):
+                work += allocation[i]
+                finish[i] = changed = True
+    if all(finish):
+        if not single:
+            for i in range(n):
+                if any(request[i] > 0) and np.any(available > 0):
+                    preempted = np.minimum(request[i], 1)
+                    available += preempted
+                    request[i] -= preempted
+        return 1
+    if action == 0:
+        return -100
+    if action <= n:
+        available += allocation[action - 1]
+        allocation[action - 1] = 0
+        request[action - 1] = 0
+        return -10
+    available += allocation[action - n - 1]
+    allocation[action - n - 1] = 0
+    return -5
+
+def test_recovery_envs_match_reference_rollouts():
+    from env import DeadlockRecoveryEnvSingle
+
+    rng = np.random.default_rng(0)
+    for env_cls, single, n, m in ((DeadlockRecoveryEnv, False, 10, 5), (DeadlockRecoveryEnvSingle, True, 3, 2)):
+        env = env_cls(num_processes=n, num_resources=m)
+        for _ in range(50):
+            # Scarce resources, so episodes start deadlocked and exercise kills and preemptions
+            allocation = rng.integers(0, 3, (n, m))
+            request = rng.integers(0, 3, (n, m))
+            available = rng.integers(0, 2, m)
+            obs = env.reset(allocation=allocation, request=request, available=available)
+            done = False
+            while not done:
+                # DeadlockRecoveryEnv only implements kills (actions 1..n)
+                action = int(rng.integers(env.action_space.n if single else n + 1))
+                obs, reward, done, _ = env.step(action)
+                assert reward == reference_step(single, allocation, request, available, action)
+                assert (obs == np.concatenate([allocation.ravel(), request.ravel(), available])).all()
+
+@pytest.mark.asyncio
+async def test_deadlock_recovery_rejects_int32_overflow(client):
+    for allocation, available in (([[3000000000, 0], [0, 1], [1, 1]], [0, 0]),
+                                  ([[2000000000, 0], [0, 1], [1, 1]], [2000000000, 0])):
+        test_input = {"allocation": allocation, "request": [[0, 1], [1, 0], [1, 0]], "available": available}
+        response = client.post("/api/deadlock_recovery_wsg", json=test_input)
+        assert response.status_code == 422
+
+def test_history_store_rotation_and_compaction(tmp_path):
+    from history import HistoryStore
+
+    store = HistoryStore(str(tmp_path), prefix="sim", max_segment_bytes=200)
+    for i in range(50):
+        store.append({"simulation_id": f"sim{i % 5}", "steps": [{"step": i}]})
+
+    assert len(store.segments(include_active=False)) > 1
+    assert store.find_last("sim3")["steps"][0]["step"] == 48
+    assert sum(1 for _ in store.iter_records()) == 50
+
+    store.rotate()
+    store.max_segment_bytes = 1 << 20
+    result = store.compact(keep_per_simulation=2)
+    assert result["segments_after"] == 1
+    assert result["records_kept"] == 10
+    assert [r["steps"][0]["step"] for r in store.iter_records("sim3")] == [43, 48]
+
+    store.retention_bytes = 0
+    store.enforce_retention()
+    assert store.segments() == []
+
+def test_history_compaction_keeps_fresh_records_under_retention(tmp_path, monkeypatch):
+    import history
+    from history import HistoryStore
+
+    store = HistoryStore(str(tmp_path), prefix="sim", retention_age=3600)
+    now = time.time()
+    # One segment written two hours ago, one now
+    monkeypatch.setattr(history.time, "time", lambda: now - 7200)
+    store.append({"simulation_id": "old", "steps": []})
+    store.rotate()
+    monkeypatch.setattr(history.time, "time", lambda: now)
+    store.append({"simulation_id": "new", "steps": []})
+    store.rotate()
+
+    assert store.compact()["segments_after"] == 1
+    store.enforce_retention()
+    assert [r["simulation_id"] for r in store.iter_records()] == ["old", "new"]
+
+@pytest.mark.asyncio
+async def test_job_submit_and_long_poll(client):
+    test_input = {
+        "allocation": [[0, 1], [2, 0]],
+        "request": [[2, 0], [0, 1]],
+        "available": [1, 1],
+        "simulation_id": "test_job_sim"
+    }
+
+    response = client.post("/api/jobs", json={"kind": "matrix", "input": test_input})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["lane"] == "interactive"
+
+    result = client.get(f"/api/jobs/{job['id']}", params={"wait": 10}).json()
+    assert result["status"] == "done"
+    assert result["result"]["deadlocked"] is False
+    assert result["result"]["simulation"]["simulation_id"] == "test_job_sim"
+
+    assert client.post("/api/jobs", json={"kind": "unknown", "input": test_input}).status_code == 422
+    assert client.get("/api/jobs/missing").status_code == 404
+
+def test_job_queue_requeues_unfinished_jobs(tmp_path):
+    from jobs import JobQueue
+
+    db_path = str(tmp_path / "jobs.sqlite3")
+    stopped = JobQueue(db_path, workers={"interactive": 0, "bulk": 0})
+    stopped.register("echo", lambda payload: payload)
+    job_id = stopped.submit("echo", {"value": 1})
+
+    # Claimed by a worker process that has since died
+    import subprocess
+    dead_pid = int(subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True
+    ).stdout)
+    stopped._execute("UPDATE jobs SET status = 'running', owner = ? WHERE id = ?", (dead_pid, job_id))
+
+    restarted = JobQueue(db_path)
+    restarted.register("echo", lambda payload: payload)
+    restarted.start()
+    restarted.wait(job_id, 10)
+    assert restarted.get(job_id)["result"] == {"value": 1}
+
+def test_job_queue_purges_finished_jobs_while_running(tmp_path, monkeypatch):
+    import jobs
+    from jobs import JobQueue
+
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers={"interactive": 1, "bulk": 0}, retention=0)
+    queue.register("echo", lambda payload: payload)
+    queue.start()
+    job_id = queue.submit("echo", {"value": 1})
+    queue.wait(job_id, 10)
+    assert queue.get(job_id)["status"] == "done"
+
+    # Idle workers purge on their own once the interval has passed
+    monkeypatch.setattr(jobs, "PURGE_INTERVAL", 0)
+    deadline = time.monotonic() + 10
+    while queue.get(job_id) is not None and time.monotonic() < deadline:
+        time.sleep(jobs.POLL_INTERVAL)
+    assert queue.get(job_id) is None
+
+@pytest.mark.asyncio
+async def test_matrix_binary_raw(client):
+    payload = dump_raw([1, 1], [[0, 1], [2, 0]], [[2, 0], [0, 1]])
+
+    response = client.post(
+        "/api/matrix/binary",
+        content=payload,
+        headers={"content-type": "application/octet-stream"}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["deadlocked"] is False
+    assert result["num_processes"] == 2
+    assert result["num_resources"] == 2
+
+@pytest.mark.asyncio
+async def test_wfg_binary_npz(client):
+    import io
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        available=np.array([0, 0]),
+        allocation=np.array([[1, 0], [0, 1]]),
+        request=np.array([[0, 1], [1, 0]])
+    )
+
+    response = client.post(
+        "/api/wfg/binary",
+        content=buffer.getvalue(),
+        headers={"content-type": "application/x-npz"}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["deadlocked"] is True
+    assert sorted(result["cycle_nodes"]) == ["P0", "P1"]
+
+@pytest.mark.asyncio
+async def test_matrix_binary_rejects_bad_shape(client):
+    payload = dump_raw([1, 1], [[0, 1], [2, 0]], [[2, 0], [0, 1]])[:-4]
+
+    response = client.post(
+        "/api/matrix/binary",
+        content=payload,
+        headers={"content-type": "application/octet-stream"}
+    )
+    assert response.status_code == 400
+
+def test_trace_replay_finds_first_deadlock(tmp_path):
+    from trace_replay import replay
+
+    events = [
+        {"op": "request", "process": 0, "resource": 0},
+        {"op": "grant", "process": 0, "resource": 0},
+        {"op": "request", "process": 1, "resource": 1},
+        {"op": "grant", "process": 1, "resource": 1},
+        {"op": "request", "process": 2, "resource": 0},
+        {"op": "cancel", "process": 2, "resource": 0},
+        {"op": "request", "process": 0, "resource": 1},
+        {"op": "request", "process": 1, "resource": 0},  # P0 <-> P1
+        {"op": "release", "process": 0, "resource": 0}
+    ]
+    trace = tmp_path / "trace.jsonl"
+    trace.write_text("\n".join(map(json.dumps, [{"processes": 3, "available": [1, 1]}] + events)))
+
+    for method in ("matrix", "wfg"):
+        result = replay(str(trace), method, check_every=4, on_wfg_change=False)
+        assert result["deadlock_event"] == 7
+        assert result["processes"] == ["P0", "P1"]
+    assert replay(str(trace), "wfg", check_every=0)["checks"] == 2
+
+    # P0 cannot finish after event 1 (no wait-for edge), and cancels before the periodic check
+    trace.write_text("\n".join(map(json.dumps, [{"processes": 2, "available": [1]}] + [
+        {"op": "grant", "process": 1, "resource": 0},
+        {"op": "request", "process": 0, "resource": 0, "amount": 2},
+        {"op": "cancel", "process": 0, "resource": 0, "amount": 2},
+        {"op": "release", "process": 1, "resource": 0}
+    ])))
+    assert replay(str(trace), "matrix", check_every=4)["deadlock_event"] == 1
+    assert replay(str(trace), "matrix", check_every=4, on_wfg_change=False)["deadlock_event"] is None
+
+    trace.write_text(json.dumps({"processes": 1, "available": [1]}) + "\n" +
+                     json.dumps({"op": "release", "process": 0, "resource": 0}))
+    with pytest.raises(ValueError, match="Event 0"):
+        replay(str(trace))
+
+def test_trace_replay_matrix_trigger_is_exact(tmp_path):
+    from trace_replay import replay, TraceState, OPS
+    from matrix import is_deadlocked
+
+    rng = np.random.default_rng(0)
+    trace = tmp_path / "trace.jsonl"
+    for _ in range(200):
+        n, m = rng.integers(1, 7), rng.integers(1, 4)
+        header = {"processes": int(n), "available": rng.integers(0, 5, m).tolist()}
+        state = TraceState(header["available"], np.zeros((n, m), dtype=np.int64), np.zeros((n, m), dtype=np.int64))
+        events, expected = [], None
+        while len(events) < 60 and expected is None:
+            op, process, resource, amount = (int(rng.integers(len(OPS))), int(rng.integers(n)),
+                                             int(rng.integers(m)), int(rng.integers(3)))
+            try:
+                state.apply(op, process, resource, amount)
+            except ValueError:
+                continue
+            events.append({"op": OPS[op], "process": process, "resource": resource, "amount": amount})
+            if is_deadlocked(*state.arrays(), save_history=False):
+                expected = len(events) - 1
+        trace.write_text("\n".join(map(json.dumps, [header] + events)))
+        assert replay(str(trace), "matrix", check_every=0)["deadlock_event"] == expected
+
+def test_batch_cli_cross_check(tmp_path):
+    from input_module import run_batch
+
+    snapshots = tmp_path / "snapshots.jsonl"
+    snapshots.write_text("\n".join(json.dumps(s) for s in [
+        {"id": "safe", "available": [1, 1], "allocation": [[0, 1], [2, 0]], "request": [[2, 0], [0, 1]]},
+        {"id": "cycle", "available": [0, 0], "allocation": [[1, 0], [0, 1]], "request": [[0, 1], [1, 0]]},
+        {"id": "bad", "available": [1], "allocation": [[1, 2]], "request": [[1]]}
+    ]))
+    output = tmp_path / "verdicts.jsonl"
+
+    stats = run_batch(str(snapshots), engine="both", workers=1, output=str(output))
+    verdicts = {v["id"]: v for v in map(json.loads, output.read_text().splitlines())}
+
+    assert stats["snapshots"] == 3
+    assert stats["errors"] == 1
+    # Multi-instance resources: the WFG sees a cycle the safety algorithm can resolve
+    assert verdicts["safe"]["matrix"] is False and verdicts["safe"]["agree"] is False
+    assert verdicts["cycle"]["matrix"] is True and verdicts["cycle"]["wfg"] is True
+    assert "error" in verdicts["bad"]
+
 if __name__ == "__main__":
     unittest.main()
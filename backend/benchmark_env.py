@@ -0,0 +1,42 @@
+import argparse
+import time
+import numpy as np
+from env import DeadlockRecoveryEnv, DeadlockRecoveryEnvSingle
+
+
+def benchmark(env_cls, num_processes, num_resources, steps, seed=0):
+    """
+    Steps an env with random actions, resetting at episode end.
+
+    Returns:
+        float: Environment steps per second
+    """
+    np.random.seed(seed)
+    env = env_cls(num_processes=num_processes, num_resources=num_resources)
+    actions = np.random.randint(0, env.action_space.n, steps)
+
+    start = time.perf_counter()
+    env.reset()
+    for action in actions:
+        _, _, done, _ = env.step(action)
+        if done:
+            env.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recovery env steps/sec")
+    parser.add_argument("--steps", type=int, default=100000)
+    args = parser.parse_args()
+
+    for env_cls, n, m in (
+        (DeadlockRecoveryEnv, 10, 5),
+        (DeadlockRecoveryEnvSingle, 3, 2),
+        (DeadlockRecoveryEnv, 100, 20),
+    ):
+        rate = benchmark(env_cls, n, m, args.steps)
+        print(f"{env_cls.__name__} {n}x{m}: {rate:,.0f} steps/sec")
+
+
+if __name__ == "__main__":
+    main()
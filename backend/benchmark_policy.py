@@ -0,0 +1,61 @@
+import argparse
+import time
+import numpy as np
+from stable_baselines3 import PPO
+from env import DeadlockRecoveryEnv, DeadlockRecoveryEnvSingle
+from lean_policy import NumpyPolicy
+
+MODELS = (
+    ("ppo_deadlock_multi_env.zip", DeadlockRecoveryEnv, 10, 5),
+    ("ppo_deadlock_recovery_single.zip", DeadlockRecoveryEnvSingle, 3, 2),
+)
+
+
+def observations(env_cls, num_processes, num_resources, count, seed=0):
+    """Observations from random rollouts of the env the model was trained on."""
+    np.random.seed(seed)
+    env = env_cls(num_processes=num_processes, num_resources=num_resources)
+    obs = env.reset()
+    collected = []
+    for action in np.random.randint(0, env.action_space.n, count):
+        collected.append(obs.copy())
+        obs, _, done, _ = env.step(action)
+        if done:
+            obs = env.reset()
+    return np.array(collected)
+
+
+def latency(policy, batch):
+    """
+    Returns:
+        float: Mean microseconds per single-observation predict(deterministic=True)
+    """
+    start = time.perf_counter()
+    for obs in batch:
+        policy.predict(obs, deterministic=True)
+    return (time.perf_counter() - start) / len(batch) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SB3 and NumPy PPO inference")
+    parser.add_argument("--observations", type=int, default=5000)
+    args = parser.parse_args()
+
+    for model_path, env_cls, n, m in MODELS:
+        sb3 = PPO.load(model_path)
+        lean = NumpyPolicy.load(model_path)
+        batch = observations(env_cls, n, m, args.observations)
+
+        expected, _ = sb3.predict(batch, deterministic=True)
+        actions, _ = lean.predict(batch, deterministic=True)
+        mismatches = int((expected != actions).sum())
+
+        sb3_us = latency(sb3, batch)
+        lean_us = latency(lean, batch)
+        print(f"{model_path}: {mismatches} / {len(batch)} actions differ")
+        print(f"  sb3   {sb3_us:8.1f} us/predict")
+        print(f"  numpy {lean_us:8.1f} us/predict ({sb3_us / lean_us:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
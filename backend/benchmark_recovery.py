@@ -0,0 +1,111 @@
+import argparse
+import time
+import numpy as np
+from env import DeadlockRecoveryEnvSingle
+from recovery_solver import solve_optimal, _deadlocked
+from lean_policy import load_policy, BACKENDS
+
+
+def scenarios(num_processes, num_resources, count, seed=0, max_units=2):
+    """
+    Yields random deadlocked (allocation, request, available) states.
+
+    The env's own reset() never starves a resource (available starts at 1),
+    so states are drawn with 0..max_units per cell and safe ones are skipped.
+    """
+    rng = np.random.default_rng(seed)
+    found = 0
+    while found < count:
+        allocation = rng.integers(0, max_units + 1, (num_processes, num_resources), dtype=np.int32)
+        request = rng.integers(0, max_units + 1, (num_processes, num_resources), dtype=np.int32)
+        available = rng.integers(0, max_units, num_resources, dtype=np.int32)
+        if _deadlocked(available, allocation, request):
+            found += 1
+            yield allocation, request, available
+
+
+def ppo_penalty(model, allocation, request, available, deterministic=True):
+    """
+    Rolls the policy out until the state is safe.
+
+    Returns:
+        int or None: Total penalty paid, or None if the episode ended still deadlocked
+    """
+    env = DeadlockRecoveryEnvSingle(num_processes=len(allocation), num_resources=len(available))
+    obs = env.reset(allocation=allocation, request=request, available=available)
+    penalty = 0
+    done = False
+    while not done:
+        if not env._is_deadlocked():
+            return penalty
+        action, _ = model.predict(obs, deterministic=deterministic)
+        obs, reward, done, _ = env.step(action)
+        penalty -= reward
+    return None if env._is_deadlocked() else penalty
+
+
+def compare(model, num_processes, num_resources, count, deterministic=True, seed=0):
+    """
+    Runs PPO and the exact solver on the same deadlocked scenarios.
+
+    Returns:
+        dict: Scenario count, how often PPO matched the optimum or never
+        recovered, the mean and worst penalty gap over recovered episodes,
+        and the time spent in each
+    """
+    gaps = []
+    failures = 0
+    ppo_time = solver_time = 0.0
+    for allocation, request, available in scenarios(num_processes, num_resources, count, seed):
+        start = time.perf_counter()
+        penalty = ppo_penalty(model, allocation, request, available, deterministic)
+        ppo_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        optimal = solve_optimal(allocation, request, available)["penalty"]
+        solver_time += time.perf_counter() - start
+
+        if penalty is None:
+            failures += 1
+        else:
+            gaps.append(penalty - optimal)
+
+    gaps = np.array(gaps)
+    return {
+        "scenarios": count,
+        "optimal": int((gaps == 0).sum()),
+        "failures": failures,
+        "mean_gap": float(gaps.mean()) if gaps.size else None,
+        "max_gap": int(gaps.max()) if gaps.size else None,
+        "ppo_seconds": ppo_time,
+        "solver_seconds": solver_time
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PPO recovery penalties with the optimal plan")
+    parser.add_argument("--model", default="ppo_deadlock_recovery_single.zip")
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--resources", type=int, default=2)
+    parser.add_argument("--scenarios", type=int, default=2000)
+    parser.add_argument("--stochastic", action="store_true", help="Sample actions like the API does")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    args = parser.parse_args()
+
+    model = load_policy(args.model, args.backend)
+    report = compare(
+        model, args.processes, args.resources, args.scenarios,
+        deterministic=not args.stochastic, seed=args.seed
+    )
+    recovered = report["scenarios"] - report["failures"]
+    print(f"{args.model} on {args.processes}x{args.resources}, {report['scenarios']} deadlocked scenarios")
+    print(f"  optimal plans:   {report['optimal']} / {recovered} recovered")
+    print(f"  never recovered: {report['failures']}")
+    if recovered:
+        print(f"  penalty gap:     mean {report['mean_gap']:.2f}, max {report['max_gap']}")
+    print(f"  time: PPO {report['ppo_seconds']:.2f}s, solver {report['solver_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import tempfile
+import numpy as np
+import fast_json
+from trace_replay import replay, METHODS
+
+
+def write_trace(path, num_processes, num_resources, num_events, units=2, seed=0):
+    """
+    Writes a synthetic trace: processes repeatedly request a resource, get it
+    when enough is free (or give up), and later release it, so the system
+    stays deadlock-free. It ends with two processes each holding one
+    resource and requesting the other's, which is a deadlock under both
+    detectors.
+
+    Returns:
+        int: Index of the event that completes the deadlock
+    """
+    rng = np.random.default_rng(seed)
+    available = [units] * num_resources
+    allocation = np.zeros((num_processes, num_resources), dtype=np.int64)
+    pids = rng.integers(0, num_processes, num_events).tolist()
+    rids = rng.integers(0, num_resources, num_events).tolist()
+
+    written = 0
+    with open(path, "wb") as f:
+        def emit(op, process, resource, amount=1):
+            nonlocal written
+            f.write(fast_json.dumps({"op": op, "process": process, "resource": resource, "amount": amount}))
+            f.write(b"\n")
+            written += 1
+
+        f.write(fast_json.dumps({"processes": num_processes, "available": available}) + b"\n")
+        for p, r in zip(pids, rids):
+            # Leave room for the releases and the six events of the final cycle
+            if written + 2 > num_events - 2 * num_processes - 6:
+                break
+            if allocation[p, r]:
+                emit("release", p, r, int(allocation[p, r]))
+                available[r] += int(allocation[p, r])
+                allocation[p, r] = 0
+                continue
+            emit("request", p, r)
+            if available[r]:
+                emit("grant", p, r)
+                available[r] -= 1
+                allocation[p, r] = 1
+            else:
+                emit("cancel", p, r)
+
+        # Free two resources completely, then build a two-process cycle on them
+        for r in (0, 1):
+            for p in np.flatnonzero(allocation[:, r]).tolist():
+                emit("release", p, r, int(allocation[p, r]))
+        emit("request", 0, 0, units)
+        emit("grant", 0, 0, units)
+        emit("request", 1, 1, units)
+        emit("grant", 1, 1, units)
+        emit("request", 0, 1)
+        emit("request", 1, 0)
+    return written - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure trace replay throughput")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=50)
+    parser.add_argument("--resources", type=int, default=10)
+    parser.add_argument("--every", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trace.jsonl")
+        expected = write_trace(path, args.processes, args.resources, args.events)
+        print(f"Trace: {args.events:,} events, {args.processes}x{args.resources}, "
+              f"deadlock at event {expected}")
+
+        for method in METHODS:
+            for on_wfg_change in (False, True):
+                result = replay(path, method, args.every, on_wfg_change)
+                trigger = "every K + trigger" if on_wfg_change else "every K"
+                print(f"  {method:6} {trigger:22} first deadlock {result['deadlock_event']}, "
+                      f"{result['checks']:,} checks, {result['events_per_minute']:,.0f} events/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SMALL_MATRIX = {
+    "allocation": [[0, 1, 0], [2, 0, 0], [3, 0, 2], [2, 1, 1], [0, 0, 2]],
+    "request": [[0, 0, 0], [2, 0, 2], [0, 0, 0], [1, 0, 0], [0, 0, 2]],
+    "available": [0, 0, 0],
+    "simulation_id": "benchmark"
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url + "/", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=body, headers={"content-type": "application/json"})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        response.read()
+        return response.status
+
+
+def run(workers, endpoint, requests, concurrency):
+    """Starts gunicorn with ``workers`` workers and returns requests/sec against ``endpoint``."""
+    port = free_port()
+    env = dict(os.environ, DEADLOCK_WORKERS=str(workers), DEADLOCK_BIND=f"127.0.0.1:{port}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_ready(base)
+        body = json.dumps(SMALL_MATRIX).encode("utf-8")
+        url = base + endpoint
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(lambda _: post(url, body), range(concurrency)))  # warm up
+            start = time.perf_counter()
+            statuses = list(pool.map(lambda _: post(url, body), range(requests)))
+            elapsed = time.perf_counter() - start
+        if any(status != 200 for status in statuses):
+            raise RuntimeError("Some requests failed")
+        return requests / elapsed
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput with 1..N gunicorn workers")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--endpoint", default="/api/matrix")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.requests} requests to {args.endpoint}, concurrency {args.concurrency}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        rate = run(workers, args.endpoint, args.requests, args.concurrency)
+        baseline = baseline or rate
+        print(f"{workers} worker(s): {rate:,.0f} req/s ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
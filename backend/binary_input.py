@@ -0,0 +1,202 @@
+import argparse
+import io
+import numpy as np
+import fast_json
+
+ARRAY_NAMES = ("available", "allocation", "request")
+
+# Raw payloads are little-endian int32: a two-value header (num_processes,
+# num_resources) followed by allocation, request and available, row-major.
+RAW_DTYPE = np.dtype("<i4")
+RAW_HEADER_SIZE = 2
+
+
+def validate_arrays(available, allocation, request):
+    """
+    Validates a detection input and returns it as NumPy arrays.
+
+    Arrays that are already NumPy arrays (including memory-mapped or
+    read-only buffer views) are returned without being copied.
+
+    Args:
+        available: Vector of available resources
+        allocation: Matrix of current resource allocation to processes
+        request: Matrix of resource requests from processes
+
+    Returns:
+        tuple: (available, allocation, request) as NumPy arrays
+    """
+    try:
+        available = np.asarray(available)
+        allocation = np.asarray(allocation)
+        request = np.asarray(request)
+    except ValueError:
+        raise ValueError("Inconsistent dimensions in input matrices")
+
+    if available.size == 0 or allocation.size == 0 or request.size == 0:
+        raise ValueError("Input arrays cannot be empty")
+
+    if available.ndim != 1 or allocation.ndim != 2 or request.ndim != 2:
+        raise ValueError("Inconsistent dimensions in input matrices")
+
+    m = available.shape[0]
+    if allocation.shape[1] != m or request.shape != allocation.shape:
+        raise ValueError("Inconsistent dimensions in input matrices")
+
+    for name, arr in zip(ARRAY_NAMES, (available, allocation, request)):
+        if arr.dtype.kind not in "iu":
+            raise ValueError(f"{name} must contain integers")
+        if arr.dtype.kind == "i" and (arr < 0).any():
+            raise ValueError(f"{name} cannot contain negative values")
+
+    return available, allocation, request
+
+
+def load_json(data):
+    """
+    Loads a detection input from a JSON body without building Pydantic models.
+
+    Args:
+        data: JSON bytes with ``available``, ``allocation``, ``request`` and an
+            optional ``simulation_id``
+
+    Returns:
+        tuple: (available, allocation, request, simulation_id); simulation_id is
+        None when the body does not set one
+    """
+    try:
+        body = fast_json.loads(data)
+    except ValueError:
+        raise ValueError("Body is not valid JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Body must be a JSON object")
+
+    missing = [name for name in ARRAY_NAMES if name not in body]
+    if missing:
+        raise ValueError(f"Body is missing fields: {', '.join(missing)}")
+
+    simulation_id = body.get("simulation_id")
+    if simulation_id is not None and not isinstance(simulation_id, str):
+        raise ValueError("simulation_id must be a string")
+
+    available, allocation, request = validate_arrays(*(body[name] for name in ARRAY_NAMES))
+    return available, allocation, request, simulation_id
+
+
+def load_npz(data):
+    """
+    Loads a detection input from the bytes of an ``.npz`` archive.
+
+    Args:
+        data: Archive bytes with ``available``, ``allocation`` and ``request`` entries
+
+    Returns:
+        tuple: Validated (available, allocation, request) arrays
+    """
+    try:
+        archive = np.load(io.BytesIO(data), allow_pickle=False)
+    except Exception:
+        raise ValueError("Payload is not a valid .npz archive")
+
+    with archive:
+        missing = [name for name in ARRAY_NAMES if name not in archive.files]
+        if missing:
+            raise ValueError(f"Archive is missing arrays: {', '.join(missing)}")
+        arrays = [archive[name] for name in ARRAY_NAMES]
+
+    return validate_arrays(*arrays)
+
+
+def load_raw(data):
+    """
+    Loads a detection input from raw little-endian int32 bytes.
+
+    The returned arrays are views into ``data``; nothing is copied.
+
+    Args:
+        data: Header (num_processes, num_resources) followed by the matrices
+
+    Returns:
+        tuple: Validated (available, allocation, request) arrays
+    """
+    if len(data) % RAW_DTYPE.itemsize != 0 or len(data) < RAW_HEADER_SIZE * RAW_DTYPE.itemsize:
+        raise ValueError("Raw payload must be a whole number of int32 values")
+
+    flat = np.frombuffer(data, dtype=RAW_DTYPE)
+    n, m = (int(x) for x in flat[:RAW_HEADER_SIZE])
+    if n <= 0 or m <= 0:
+        raise ValueError("Raw payload header must contain positive dimensions")
+
+    body = flat[RAW_HEADER_SIZE:]
+    cells = n * m
+    if body.size != 2 * cells + m:
+        raise ValueError("Raw payload size does not match its shape header")
+
+    allocation = body[:cells].reshape(n, m)
+    request = body[cells:2 * cells].reshape(n, m)
+    available = body[2 * cells:]
+
+    return validate_arrays(available, allocation, request)
+
+
+def dump_raw(available, allocation, request):
+    """
+    Encodes a detection input in the raw int32 format read by ``load_raw``.
+    """
+    available, allocation, request = validate_arrays(available, allocation, request)
+    header = np.array(allocation.shape, dtype=RAW_DTYPE)
+    return b"".join(
+        np.ascontiguousarray(arr, dtype=RAW_DTYPE).tobytes()
+        for arr in (header, allocation, request, available)
+    )
+
+
+def load_npy_files(available_path, allocation_path, request_path, mmap=True):
+    """
+    Loads a detection input from three ``.npy`` files.
+
+    With ``mmap`` set, the files are memory-mapped read-only so only the
+    pages touched by the detector are read from disk.
+    """
+    mode = "r" if mmap else None
+    arrays = [
+        np.load(path, mmap_mode=mode, allow_pickle=False)
+        for path in (available_path, allocation_path, request_path)
+    ]
+    return validate_arrays(*arrays)
+
+
+def main():
+    from matrix import is_deadlocked
+    from rag_wfg import run_deadlock_detection
+
+    parser = argparse.ArgumentParser(description="Run deadlock detection on .npy matrices")
+    parser.add_argument("--available", required=True, help="Path to available vector (.npy)")
+    parser.add_argument("--allocation", required=True, help="Path to allocation matrix (.npy)")
+    parser.add_argument("--request", required=True, help="Path to request matrix (.npy)")
+    parser.add_argument("--method", choices=("matrix", "wfg"), default="matrix")
+    parser.add_argument("--no-mmap", action="store_true", help="Read the files into memory")
+    args = parser.parse_args()
+
+    available, allocation, request = load_npy_files(
+        args.available, args.allocation, args.request, mmap=not args.no_mmap
+    )
+    print(f"Loaded {allocation.shape[0]} processes x {allocation.shape[1]} resources")
+
+    if args.method == "matrix":
+        if is_deadlocked(available, allocation, request, save_history=False, validate=False):
+            print("🔴 Deadlock detected using matrix.")
+        else:
+            print("✅ No deadlock detected using matrix.")
+    else:
+        deadlocked, cycle_nodes, _ = run_deadlock_detection(
+            available, allocation, request, save_history=False, validate=False
+        )
+        if deadlocked:
+            print(f"🔴 Deadlock detected using WFG. Cycle Nodes: {cycle_nodes}")
+        else:
+            print("✅ No deadlock detected using WFG.")
+
+
+if __name__ == "__main__":
+    main()
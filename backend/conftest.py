@@ -1,29 +1,20 @@
 import pytest
 from fastapi.testclient import TestClient
 import os
-import json
 import sys
+import tempfile
 from pathlib import Path
 
 # Add the backend directory to the Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
+# Keep simulation history written by the tests out of the working tree
+os.environ.setdefault("DEADLOCK_HISTORY_DIR", tempfile.mkdtemp(prefix="deadlock_history_"))
+os.environ.setdefault("DEADLOCK_JOBS_DB", os.path.join(tempfile.mkdtemp(prefix="deadlock_jobs_"), "jobs.sqlite3"))
+
 from main import app
 
 @pytest.fixture(scope="session")
 def client():
     """Create a test client for the FastAPI application"""
     return TestClient(app)
-
-@pytest.fixture(autouse=True)
-def setup_test_files():
-    """Setup function that runs before each test"""
-    # Create empty simulation files if they don't exist
-    if not os.path.exists("matrix_simulations.json"):
-        with open("matrix_simulations.json", "w") as f:
-            json.dump([], f)
-    if not os.path.exists("deadlock_simulations.json"):
-        with open("deadlock_simulations.json", "w") as f:
-            json.dump([], f)
-    yield
-    # Cleanup after tests if needed
\ No newline at end of file
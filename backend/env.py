@@ -4,7 +4,113 @@ import gym
 from gym import spaces
 import numpy as np
 
-class DeadlockRecoveryEnv(gym.Env):
+INT32_MAX = np.iinfo(np.int32).max
+
+def check_int32_state(allocation, request, available):
+    """
+    Raises ValueError unless a state fits the envs' int32 buffer, including
+    every unit that kills and preemptions can move into available.
+    """
+    arrays = [np.asarray(a, dtype=np.int64) for a in (allocation, request, available)]
+    if any(a.size and a.max() > INT32_MAX for a in arrays):
+        raise ValueError(f"Values cannot exceed {INT32_MAX}")
+    allocation, request, available = arrays
+    if (available + allocation.sum(axis=0) + request.sum(axis=0) > INT32_MAX).any():
+        raise ValueError(f"Available plus all allocated and requested units cannot exceed {INT32_MAX}")
+
+class RecoveryEnvBase(gym.Env):
+    """
+    Shared state handling for the recovery envs.
+
+    allocation, request and available are int32 views into one flat buffer
+    laid out exactly like the observation (allocation + request + available),
+    so observations need no copying. The buffer is allocated once per env and
+    reused across resets; steps only write into it.
+    """
+
+    # Ranges (low, high) for randomly generated states, as in np.random.randint
+    allocation_range = (0, 3)
+    request_range = (0, 3)
+    available_range = (3, 7)
+
+    def _init_state(self):
+        n, m = self.num_processes, self.num_resources
+        cells = n * m
+        self.state = np.zeros(2 * cells + m, dtype=np.int32)
+        self.allocation = self.state[:cells].reshape(n, m)
+        self.request = self.state[cells:2 * cells].reshape(n, m)
+        self.available = self.state[2 * cells:]
+
+        # Scratch space for the safety check and preemption
+        self._work = np.empty(m, dtype=np.int64)
+        self._finish = np.empty(n, dtype=bool)
+        self._preempted = np.empty((n, m), dtype=np.int32)
+
+    def _load(self, view, values, value_range):
+        if values is None:
+            view[...] = np.random.randint(*value_range, view.shape)
+        elif np.shape(values) != view.shape:
+            raise ValueError(f"Expected shape {view.shape}, got {np.shape(values)}")
+        else:
+            view[...] = values
+
+    def reset(self, allocation=None, request=None, available=None):
+        if not hasattr(self, "state"):
+            self._init_state()
+        if allocation is not None and request is not None and available is not None:
+            check_int32_state(allocation, request, available)
+        self._load(self.allocation, allocation, self.allocation_range)
+        self._load(self.request, request, self.request_range)
+        self._load(self.available, available, self.available_range)
+
+        self.steps = 0
+        self.last_action = None
+        self.last_killed = None
+        self.last_preempted = []
+        self._deadlocked = None
+
+        return self._get_obs()
+
+    def _get_obs(self):
+        # A view of the live state: copy it to keep an observation past the next step
+        return self.state
+
+    def _kill_process(self, pid):
+        self._deadlocked = None
+        self.available += self.allocation[pid]
+        self.allocation[pid] = 0
+        self.request[pid] = 0
+
+    def _is_deadlocked(self):
+        # The flag is cached until the state changes, so render() and step()
+        # on the same state share one safety check
+        if self._deadlocked is None:
+            self._deadlocked = self._check_deadlock()
+        return self._deadlocked
+
+    def set_deadlocked(self, flag):
+        """Seeds the deadlock flag for the current state with a known result (e.g. a memoized one)."""
+        self._deadlocked = flag
+
+    def _check_deadlock(self):
+        work = self._work
+        finish = self._finish
+        work[...] = self.available
+        finish[...] = False
+
+        # Each pass finishes every process whose request fits in work; the set of
+        # processes that can finish does not depend on the order they are tried in
+        while True:
+            runnable = ~finish & (self.request <= work).all(axis=1)
+            if not runnable.any():
+                break
+            work += self.allocation[runnable].sum(axis=0)
+            finish |= runnable
+
+        return not finish.all()
+
+
+class DeadlockRecoveryEnv(RecoveryEnvBase):
     def __init__(self, num_processes=10, num_resources=5):
         super(DeadlockRecoveryEnv, self).__init__()
         self.num_processes = num_processes
@@ -20,36 +126,6 @@ class DeadlockRecoveryEnv(gym.Env):
 
         self.reset()
 
-    def reset(self, allocation=None, request=None, available=None):
-        if allocation is not None:
-            self.allocation = np.array(allocation)
-        else:
-            self.allocation = np.random.randint(0, 3, (self.num_processes, self.num_resources))
-
-        if request is not None:
-            self.request = np.array(request)
-        else:
-            self.request = np.random.randint(0, 3, (self.num_processes, self.num_resources))
-
-        if available is not None:
-            self.available = np.array(available)
-        else:
-            self.available = np.random.randint(3, 7, self.num_resources)
-
-        self.steps = 0
-        self.last_action = None
-        self.last_killed = None
-        self.last_preempted = []
-
-        return self._get_obs()
-
-    def _get_obs(self):
-        return np.concatenate([
-            self.allocation.flatten(),
-            self.request.flatten(),
-            self.available
-        ])
-
     def step(self, action):
         reward = 0
         done = False
@@ -66,10 +142,10 @@ class DeadlockRecoveryEnv(gym.Env):
                 self.last_killed = action - 1
         else:
             reward = 1
-            for i in range(self.num_processes):
-                if any(self.request[i] > 0) and np.any(self.available > 0):
-                    self._preempt_request(i)
-                    self.last_preempted.append(i)
+            # Preempting only ever adds to available, so once it is non-zero
+            # every process with an outstanding request is preempted
+            if self.available.any():
+                self.last_preempted = self._preempt_requests()
 
         self.steps += 1
         if self.steps >= 20:
@@ -77,30 +153,13 @@ class DeadlockRecoveryEnv(gym.Env):
 
         return self._get_obs(), reward, done, {}
 
-    def _kill_process(self, pid):
-        self.available += self.allocation[pid]
-        self.allocation[pid] = 0
-        self.request[pid] = 0
-
-    def _preempt_request(self, pid):
-        preempted = np.minimum(self.request[pid], np.ones_like(self.request[pid]))
-        self.available += preempted
-        self.request[pid] -= preempted
-
-    def _is_deadlocked(self):
-        work = self.available.copy()
-        finish = [False] * self.num_processes
-
-        changed = True
-        while changed:
-            changed = False
-            for i in range(self.num_processes):
-                if not finish[i] and np.all(self.request[i] <= work):
-                    work += self.allocation[i]
-                    finish[i] = True
-                    changed = True
-
-        return not all(finish)
+    def _preempt_requests(self):
+        # Reclaim one unit of every requested resource from every process
+        self._deadlocked = None
+        preempted = np.minimum(self.request, 1, out=self._preempted)
+        self.available += preempted.sum(axis=0, dtype=np.int32)
+        self.request -= preempted
+        return np.flatnonzero(preempted.any(axis=1)).tolist()
 
     def render(self, mode='human'):
         print("\n==========================")
@@ -123,7 +182,12 @@ class DeadlockRecoveryEnv(gym.Env):
         print("==========================\n")
 
 
-class DeadlockRecoveryEnvSingle(gym.Env):
+
+class DeadlockRecoveryEnvSingle(RecoveryEnvBase):
+    allocation_range = (0, 2)
+    request_range = (0, 2)
+    available_range = (1, 3)
+
     def __init__(self, num_processes=3, num_resources=2):
         self.num_processes = num_processes
         self.num_resources = num_resources
@@ -141,32 +205,6 @@ class DeadlockRecoveryEnvSingle(gym.Env):
 
         self.reset()
 
-    def reset(self, allocation=None, request=None, available=None):
-        if allocation is not None:
-            self.allocation = np.array(allocation)
-        else:
-            self.allocation = np.random.randint(0, 2, (self.num_processes, self.num_resources))
-        if request is not None:
-            self.request = np.array(request)
-        else:
-            self.request = np.random.randint(0, 2, (self.num_processes, self.num_resources))
-        if available is not None:
-            self.available = np.array(available)
-        else:
-            self.available = np.random.randint(1, 3, self.num_resources)
-        self.steps = 0
-        self.last_action = None
-        self.last_killed = None
-        self.last_preempted = []
-        return self._get_obs()
-
-    def _get_obs(self):
-        return np.concatenate([
-            self.allocation.flatten(),
-            self.request.flatten(),
-            self.available
-        ])
-
     def step(self, action):
         reward = 0
         done = False
@@ -189,31 +227,12 @@ class DeadlockRecoveryEnvSingle(gym.Env):
 
         return self._get_obs(), reward, done, {}
 
-    def _kill_process(self, pid):
-        self.available += self.allocation[pid]
-        self.allocation[pid] = 0
-        self.request[pid] = 0
-
     def _preempt_process(self, pid):
         # Only reclaim allocated resources, keep requests unchanged
+        self._deadlocked = None
         self.available += self.allocation[pid]
         self.allocation[pid] = 0  # Simulate forced resource reclaim
 
-    def _is_deadlocked(self):
-        work = self.available.copy()
-        finish = [False] * self.num_processes
-
-        changed = True
-        while changed:
-            changed = False
-            for i in range(self.num_processes):
-                if not finish[i] and np.all(self.request[i] <= work):
-                    work += self.allocation[i]
-                    finish[i] = True
-                    changed = True
-
-        return not all(finish)
-
     def render(self, mode='human'):
         print("\n==========================")
         print(f"Step: {self.steps}")
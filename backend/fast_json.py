@@ -0,0 +1,30 @@
+import json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(data):
+    """Parses JSON from bytes or str, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """Serializes to JSON bytes. NumPy arrays and scalars are written as lists/numbers."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
@@ -0,0 +1,25 @@
+# Multi-worker deployment: gunicorn -c gunicorn.conf.py main:app
+import os
+
+bind = os.environ.get("DEADLOCK_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("DEADLOCK_WORKERS", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# One BLAS/OpenMP thread per worker, so N workers don't oversubscribe the
+# CPUs; set before the app is preloaded, when NumPy reads them
+for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(variable, "1")
+
+# Import main (and load both PPO models) once in the master; workers are
+# forked from it and share the weights copy-on-write instead of each
+# loading their own copy
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Only the sb3 backend runs torch; importing it here under the NumPy
+    # backend would load it into every worker, unshared
+    import lean_policy
+    if lean_policy.POLICY_BACKEND == "sb3":
+        import torch
+        torch.set_num_threads(1)
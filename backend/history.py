@@ -0,0 +1,375 @@
+import argparse
+import gzip
+import io
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+import fast_json
+
+try:
+    import zstandard
+except ImportError:  # zstd segments need the optional zstandard package
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; only threads are locked out there
+    fcntl = None
+
+HISTORY_DIR = os.environ.get("DEADLOCK_HISTORY_DIR", "history")
+
+ACTIVE_SUFFIX = ".jsonl"
+SEALED_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def _open_segment(path):
+    """Opens a segment for line-by-line reading, decompressing as it goes."""
+    if path.endswith(ACTIVE_SUFFIX) and not os.path.exists(path):
+        # Sealed by another worker since it was listed
+        for suffix in SEALED_SUFFIXES.values():
+            sealed = path[:-len(ACTIVE_SUFFIX)] + suffix
+            if os.path.exists(sealed):
+                return _open_segment(sealed)
+    if path.endswith(SEALED_SUFFIXES["gzip"]):
+        return gzip.open(path, "rb")
+    if path.endswith(SEALED_SUFFIXES["zstd"]):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    return open(path, "rb")
+
+
+def _create_segment(path, compression):
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+    return gzip.open(path, "wb", compresslevel=6)
+
+
+class HistoryStore:
+    """
+    Append-only simulation history kept as a directory of JSON-lines segments.
+
+    Records are appended to one uncompressed active segment. When it grows
+    past ``max_segment_bytes`` or gets older than ``max_segment_age`` seconds
+    it is sealed: compressed (gzip, or zstd if requested and installed) and
+    replaced by a fresh active segment. Sealed segments older than
+    ``retention_age`` seconds, or beyond ``retention_bytes`` in total, are
+    deleted oldest first. Readers stream segments one line at a time.
+
+    Segment names start with a millisecond timestamp, so sorting by name
+    sorts them oldest to newest.
+
+    Several processes (e.g. uvicorn/gunicorn workers) can share a store:
+    appends, rotation and retention hold an exclusive ``flock`` on the
+    directory's lock file, and each record is written with a single append.
+    """
+
+    def __init__(self, directory, prefix="history", max_segment_bytes=8 * 1024 * 1024,
+                 max_segment_age=24 * 3600, retention_age=30 * 24 * 3600,
+                 retention_bytes=512 * 1024 * 1024, compression="gzip"):
+        if compression not in SEALED_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            compression = "gzip"
+
+        self.directory = directory
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.retention_age = retention_age
+        self.retention_bytes = retention_bytes
+        self.compression = compression
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the store, across threads and processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._thread_lock, open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Segments
+
+    def _new_segment_name(self, suffix):
+        # Strictly after the newest segment, so names never collide and keep their order
+        ms = int(time.time() * 1000)
+        existing = self.segments()
+        if existing:
+            ms = max(ms, int(self._segment_time(existing[-1]) * 1000) + 1)
+        return f"{self.prefix}-{ms:013d}-{os.getpid()}{suffix}"
+
+    def _segment_time(self, path):
+        """Creation time of a segment, in seconds, taken from its name."""
+        return int(os.path.basename(path)[len(self.prefix) + 1:].split("-", 1)[0]) / 1000
+
+    def segments(self, include_active=True):
+        """Paths of all segments, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = set(os.listdir(self.directory))
+        sealed = {
+            name for name in names
+            if name.startswith(self.prefix + "-") and name.endswith(tuple(SEALED_SUFFIXES.values()))
+        }
+        active = set()
+        if include_active:
+            # Skip an active segment whose sealed copy already exists (mid-seal)
+            active = {
+                name for name in names
+                if name.startswith(self.prefix + "-") and name.endswith(ACTIVE_SUFFIX)
+                and not any(name + suffix[len(ACTIVE_SUFFIX):] in sealed for suffix in SEALED_SUFFIXES.values())
+            }
+        return [os.path.join(self.directory, name) for name in sorted(sealed | active)]
+
+    def active_segment(self):
+        """Path of the active segment, created if there is none."""
+        os.makedirs(self.directory, exist_ok=True)
+        active = [path for path in self.segments() if path.endswith(ACTIVE_SUFFIX)]
+        if active:
+            return active[-1]
+        path = os.path.join(self.directory, self._new_segment_name(ACTIVE_SUFFIX))
+        open(path, "ab").close()
+        return path
+
+    def _seal(self, path):
+        """Compresses an active segment and removes the uncompressed file."""
+        sealed = path[:-len(ACTIVE_SUFFIX)] + SEALED_SUFFIXES[self.compression]
+        tmp = sealed + ".tmp"
+        with open(path, "rb") as src, _create_segment(tmp, self.compression) as dst:
+            for chunk in iter(lambda: src.read(1 << 20), b""):
+                dst.write(chunk)
+        os.replace(tmp, sealed)
+        os.remove(path)
+        return sealed
+
+    def _needs_rotation(self, path):
+        size = os.path.getsize(path)
+        age = time.time() - self._segment_time(path)
+        return size > 0 and (size >= self.max_segment_bytes or age >= self.max_segment_age)
+
+    # Writing
+
+    def append(self, record):
+        """
+        Appends one record and returns the path of the segment it went to.
+        Rotation and retention run as part of the append.
+        """
+        line = fast_json.dumps(record) + b"\n"
+        with self._locked():
+            path = self.active_segment()
+            if self._needs_rotation(path):
+                self._seal(path)
+                self._enforce_retention()
+                path = self.active_segment()
+
+            with open(path, "ab") as f:
+                f.write(line)
+        return path
+
+    def rotate(self):
+        """Seals the active segment now, whatever its size or age."""
+        with self._locked():
+            for path in self.segments():
+                if path.endswith(ACTIVE_SUFFIX) and os.path.getsize(path) > 0:
+                    self._seal(path)
+
+    def enforce_retention(self):
+        """Deletes sealed segments that are too old or exceed the size budget."""
+        with self._locked():
+            return self._enforce_retention()
+
+    def _enforce_retention(self):
+        sealed = self.segments(include_active=False)
+        now = time.time()
+        total = sum(os.path.getsize(path) for path in sealed)
+        removed = []
+        for path in sealed:
+            expired = self.retention_age is not None and now - self._segment_time(path) > self.retention_age
+            over_budget = self.retention_bytes is not None and total > self.retention_bytes
+            if not (expired or over_budget):
+                break
+            total -= os.path.getsize(path)
+            os.remove(path)
+            removed.append(path)
+        return removed
+
+    # Reading
+
+    def iter_segment(self, path):
+        """Yields the records of one segment, decoding one line at a time."""
+        with _open_segment(path) as f:
+            for line in f:
+                if line.strip():
+                    yield fast_json.loads(line)
+
+    def iter_records(self, simulation_id=None):
+        """Yields records oldest first, optionally only those with a simulation_id."""
+        for path in self.segments():
+            for record in self.iter_segment(path):
+                if simulation_id is None or record.get("simulation_id") == simulation_id:
+                    yield record
+
+    def find_last(self, simulation_id):
+        """
+        Latest record for a simulation_id. Segments are scanned newest first,
+        so older segments are not decompressed once a match is found.
+        """
+        needle = fast_json.dumps(simulation_id)
+        for path in reversed(self.segments()):
+            last = None
+            with _open_segment(path) as f:
+                for line in f:
+                    # Only decode lines that can contain the id
+                    if needle in line:
+                        record = fast_json.loads(line)
+                        if record.get("simulation_id") == simulation_id:
+                            last = record
+            if last is not None:
+                return last
+        return None
+
+    # Maintenance
+
+    def compact(self, keep_per_simulation=None):
+        """
+        Rewrites the sealed segments into as few full-size segments as possible.
+
+        The new segments are written without holding the store lock, so
+        appends carry on meanwhile; the lock is only taken to swap them in.
+        If retention removed one of the inputs in the meantime, nothing is
+        swapped and the result reports ``aborted``.
+
+        Args:
+            keep_per_simulation: If set, only the newest N records of each
+                simulation_id are kept
+
+        Returns:
+            dict: Segment and record counts before and after
+        """
+        sealed = self.segments(include_active=False)
+        if not sealed:
+            return {"segments_before": 0, "segments_after": 0, "records_kept": 0, "records_dropped": 0}
+
+        remaining = Counter()
+        if keep_per_simulation is not None:
+            for path in sealed:
+                for record in self.iter_segment(path):
+                    remaining[record.get("simulation_id")] += 1
+
+        suffix = SEALED_SUFFIXES[self.compression]
+        # Temporary path of each output and the newest input it took records from
+        written = []
+        kept = dropped = 0
+        out = None
+        out_bytes = 0
+        try:
+            for path in sealed:
+                for line in _iter_lines(path):
+                    if keep_per_simulation is not None:
+                        simulation_id = fast_json.loads(line).get("simulation_id")
+                        remaining[simulation_id] -= 1
+                        if remaining[simulation_id] >= keep_per_simulation:
+                            dropped += 1
+                            continue
+                    if out is None or out_bytes >= self.max_segment_bytes:
+                        if out is not None:
+                            out.close()
+                        target = os.path.join(self.directory, f"{self.prefix}-compact-{len(written):04d}{suffix}.tmp")
+                        written.append([target, path])
+                        out = _create_segment(target, self.compression)
+                        out_bytes = 0
+                    written[-1][1] = path
+                    out.write(line)
+                    out_bytes += len(line)
+                    kept += 1
+        finally:
+            if out is not None:
+                out.close()
+
+        with self._locked():
+            if not all(os.path.exists(path) for path in sealed):
+                for target, _ in written:
+                    os.remove(target)
+                return {"aborted": True, "segments_before": len(sealed), "segments_after": len(sealed),
+                        "records_kept": 0, "records_dropped": 0}
+            for path in sealed:
+                os.remove(path)
+            for i, (target, newest) in enumerate(written):
+                # Each output takes the time of the newest input in it, so retention
+                # never ages records out sooner than their original segment would
+                newest = int(self._segment_time(newest) * 1000)
+                os.replace(target, os.path.join(self.directory, f"{self.prefix}-{newest:013d}-c{i:04d}{suffix}"))
+
+        return {
+            "segments_before": len(sealed),
+            "segments_after": len(written),
+            "records_kept": kept,
+            "records_dropped": dropped
+        }
+
+    def import_legacy(self, filename):
+        """Appends the records of an old single-file JSON history (a list of simulations)."""
+        with open(filename, "rb") as f:
+            records = fast_json.loads(f.read() or b"[]")
+        for record in records:
+            self.append(record)
+        return len(records)
+
+    def stats(self):
+        segments = self.segments()
+        return {
+            "directory": self.directory,
+            "segments": len(segments),
+            "bytes": sum(os.path.getsize(path) for path in segments),
+            "compression": self.compression
+        }
+
+
+def _iter_lines(path):
+    with _open_segment(path) as f:
+        for line in f:
+            if line.strip():
+                yield line if line.endswith(b"\n") else line + b"\n"
+
+
+MATRIX_HISTORY = HistoryStore(os.path.join(HISTORY_DIR, "matrix"), prefix="matrix")
+WFG_HISTORY = HistoryStore(os.path.join(HISTORY_DIR, "wfg"), prefix="wfg")
+STORES = {"matrix": MATRIX_HISTORY, "wfg": WFG_HISTORY}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage simulation history segments")
+    parser.add_argument("store", choices=sorted(STORES))
+    parser.add_argument("command", choices=("stats", "rotate", "retention", "compact", "import"))
+    parser.add_argument("--keep", type=int, default=None,
+                        help="compact: keep only the newest N records per simulation_id")
+    parser.add_argument("--file", help="import: legacy JSON history file")
+    args = parser.parse_args()
+
+    store = STORES[args.store]
+    if args.command == "stats":
+        print(store.stats())
+    elif args.command == "rotate":
+        store.rotate()
+        print(store.stats())
+    elif args.command == "retention":
+        print(f"Removed {len(store.enforce_retention())} segments")
+    elif args.command == "compact":
+        store.rotate()
+        print(store.compact(keep_per_simulation=args.keep))
+    else:
+        if not args.file:
+            parser.error("import needs --file")
+        print(f"Imported {store.import_legacy(args.file)} simulations")
+
+
+if __name__ == "__main__":
+    main()
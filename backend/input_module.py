@@ -1,5 +1,20 @@
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+import numpy as np
 from matrix import is_deadlocked as banker_deadlock
 from rag_wfg import run_deadlock_detection as wfg_deadlock
+from binary_input import ARRAY_NAMES, load_npy_files, validate_arrays
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+ENGINES = ("matrix", "wfg", "both")
 
 def load_static_inputs():
     available = [1, 0, 0]
@@ -19,7 +34,110 @@ def load_static_inputs():
 
     return available, allocation, request
 
-def main():
+def iter_snapshots(path):
+    """
+    Yields (snapshot_id, kind, payload) tuples without loading the snapshots.
+
+    ``path`` is either a JSON-lines file with one {"available", "allocation",
+    "request", optional "id"} object per line, or a directory holding one
+    ``.npz`` file or one sub-directory of ``available.npy``/``allocation.npy``/
+    ``request.npy`` per snapshot. Payloads are parsed in the worker processes.
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                yield name, "npy", full
+            elif name.endswith(".npz"):
+                yield name[:-len(".npz")], "npz", full
+        return
+
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if line:
+                yield str(line_no), "json", line
+
+def load_snapshot(kind, payload):
+    if kind == "json":
+        arrays = validate_arrays(*(payload[name] for name in ARRAY_NAMES))
+    elif kind == "npz":
+        with np.load(payload, allow_pickle=False) as archive:
+            arrays = validate_arrays(*(archive[name] for name in ARRAY_NAMES))
+    else:
+        arrays = load_npy_files(*(os.path.join(payload, f"{name}.npy") for name in ARRAY_NAMES))
+    return arrays
+
+def detect_snapshot(task):
+    """Runs the chosen engine on one snapshot and returns its verdict."""
+    engine, (snapshot_id, kind, payload) = task
+    try:
+        if kind == "json":
+            payload = json.loads(payload)
+            snapshot_id = str(payload.get("id", snapshot_id))
+        available, allocation, request = load_snapshot(kind, payload)
+        verdict = {"id": snapshot_id}
+        if engine in ("matrix", "both"):
+            verdict["matrix"] = banker_deadlock(available, allocation, request, save_history=False, validate=False)
+        if engine in ("wfg", "both"):
+            deadlocked, cycle_nodes, _ = wfg_deadlock(available, allocation, request, save_history=False, validate=False)
+            verdict["wfg"] = deadlocked
+            verdict["cycle_nodes"] = sorted(cycle_nodes)
+        if engine == "both":
+            verdict["agree"] = verdict["matrix"] == verdict["wfg"]
+        return verdict
+    except Exception as e:
+        return {"id": snapshot_id, "error": str(e)}
+
+def peak_memory_mb():
+    """Peak resident memory of this process and its workers, in MB."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(usage, children) / scale
+
+def run_batch(path, engine="matrix", workers=None, output=None, chunksize=16):
+    """
+    Streams snapshots through the detection engine(s) and writes one JSON
+    verdict per line to ``output`` (stdout by default).
+
+    Returns:
+        dict: Counts, elapsed time, throughput and peak memory
+    """
+    out = open(output, "w") if output else sys.stdout
+    tasks = ((engine, snapshot) for snapshot in iter_snapshots(path))
+    counts = {"snapshots": 0, "deadlocked": 0, "errors": 0, "disagreements": 0}
+    start = time.perf_counter()
+
+    pool = Pool(workers) if workers != 1 else None
+    try:
+        verdicts = pool.imap(detect_snapshot, tasks, chunksize) if pool else map(detect_snapshot, tasks)
+        for verdict in verdicts:
+            counts["snapshots"] += 1
+            if "error" in verdict:
+                counts["errors"] += 1
+            elif verdict.get("matrix") or verdict.get("wfg"):
+                counts["deadlocked"] += 1
+            if verdict.get("agree") is False:
+                counts["disagreements"] += 1
+            out.write(json.dumps(verdict) + "\n")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    counts["elapsed_s"] = elapsed
+    counts["snapshots_per_s"] = counts["snapshots"] / elapsed if elapsed > 0 else 0.0
+    counts["peak_memory_mb"] = peak_memory_mb()
+    return counts
+
+def interactive():
     print("=== Deadlock Detection Tool ===")
     print("Choose method:")
     print("1. Safety Algorithm (Matrix-Based)")
@@ -47,5 +165,33 @@ def main():
             print("✅ No deadlock detected using WFG.")
         print(f"Simulation steps saved to: {file_path}")
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="Deadlock detection. Runs interactively on the built-in example "
+                    "when no input is given, or in batch over a snapshot corpus."
+    )
+    parser.add_argument("input", nargs="?", help="JSON-lines file or directory of .npy/.npz snapshots")
+    parser.add_argument("--engine", choices=ENGINES, default="matrix",
+                        help="Detection engine; 'both' cross-checks matrix against WFG")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=16, help="Snapshots handed to a worker at a time")
+    parser.add_argument("--output", help="Write verdicts here instead of stdout")
+    args = parser.parse_args()
+
+    if args.input is None:
+        interactive()
+        return
+
+    stats = run_batch(args.input, args.engine, args.workers, args.output, args.chunksize)
+    peak = stats["peak_memory_mb"]
+    print(
+        f"Processed {stats['snapshots']} snapshots in {stats['elapsed_s']:.2f}s "
+        f"({stats['snapshots_per_s']:.1f} snapshots/sec), "
+        f"{stats['deadlocked']} deadlocked, {stats['errors']} errors"
+        + (f", {stats['disagreements']} matrix/WFG disagreements" if args.engine == "both" else ""),
+        file=sys.stderr
+    )
+    print(f"Peak memory: {peak:.1f} MB" if peak is not None else "Peak memory: unavailable", file=sys.stderr)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,245 @@
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+import fast_json
+
+JOBS_DB = os.environ.get("DEADLOCK_JOBS_DB", "jobs.sqlite3")
+
+# Interactive jobs get their own workers so they never wait behind bulk work
+LANES = ("interactive", "bulk")
+
+# How often idle workers and long-polls look for work done by other processes
+POLL_INTERVAL = 0.2
+
+# How often idle workers delete finished jobs past their retention, in seconds
+PURGE_INTERVAL = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    lane TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    result BLOB,
+    error TEXT,
+    owner INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, lane, created_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, finished_at);
+"""
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+
+class JobQueue:
+    """
+    In-process job runner for slow detection and recovery requests.
+
+    The SQLite table is the queue: worker threads claim the oldest queued
+    job of their lane in a transaction, so several server processes can
+    share one database and any of them can pick up, run or report on any
+    job. Each lane has its own worker threads.
+
+    Jobs survive a restart: ``start()`` re-queues jobs left running by a
+    process that no longer exists. Everything process-specific (threads,
+    the connection) is created lazily in the process that uses it, so a
+    queue created before a fork (gunicorn ``--preload``) works in each
+    worker.
+
+    Handlers are registered per job kind and take the decoded payload,
+    returning a JSON-serializable result.
+    """
+
+    def __init__(self, db_path=JOBS_DB, workers=None, retention=24 * 3600):
+        self.db_path = db_path
+        self.workers = workers or {"interactive": 2, "bulk": 1}
+        self.retention = retention
+        self.handlers = {}
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.threads = []
+        self.db = None
+        self.lock = threading.Lock()
+        self.wakeup = {lane: threading.Condition() for lane in LANES}
+        self.finished = threading.Condition()
+        self.last_purge = None
+
+    def _check_fork(self):
+        if self.pid != os.getpid():
+            self._reset()
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def _connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(SCHEMA)
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:  # Databases created before multi-worker support
+                self.db.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        return self.db
+
+    def _execute(self, sql, params=()):
+        self._check_fork()
+        with self.lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def start(self):
+        """Starts this process's worker threads and re-queues jobs orphaned by dead processes."""
+        self._check_fork()
+        if self.threads:
+            return
+        self.purge()
+        for job_id, owner in self._execute("SELECT id, owner FROM jobs WHERE status = 'running'"):
+            if owner is None or not _process_alive(owner):
+                self._execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, started_at = NULL "
+                    "WHERE id = ? AND status = 'running'", (job_id,)
+                )
+
+        for lane in LANES:
+            for i in range(self.workers.get(lane, 0)):
+                thread = threading.Thread(target=self._work, args=(lane,), name=f"job-{lane}-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, kind, payload, lane="interactive"):
+        """Persists a job and wakes a worker. Returns the job id."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+
+        self.start()
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, kind, lane, status, payload, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, lane, fast_json.dumps(payload), time.time())
+        )
+        with self.wakeup[lane]:
+            self.wakeup[lane].notify()
+        return job_id
+
+    def _claim(self, lane):
+        """Atomically marks the oldest queued job of a lane as ours. Returns (id, kind, payload) or None."""
+        self._check_fork()
+        with self.lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT id, kind, payload FROM jobs WHERE status = 'queued' AND lane = ? "
+                    "ORDER BY created_at LIMIT 1", (lane,)
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, started_at = ? WHERE id = ?",
+                        (os.getpid(), time.time(), row[0])
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return row
+
+    def _work(self, lane):
+        while True:
+            job = self._claim(lane)
+            if job is None:
+                if self.last_purge is None or time.monotonic() - self.last_purge >= PURGE_INTERVAL:
+                    self.purge()
+                # Woken by a local submit, or poll for jobs queued by other processes
+                with self.wakeup[lane]:
+                    self.wakeup[lane].wait(POLL_INTERVAL)
+                continue
+            self._run(*job)
+            with self.finished:
+                self.finished.notify_all()
+
+    def _run(self, job_id, kind, payload):
+        try:
+            result = self.handlers[kind](fast_json.loads(payload))
+            self._execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished_at = ? WHERE id = ?",
+                (fast_json.dumps(result), time.time(), job_id)
+            )
+        except Exception as e:
+            traceback.print_exc()
+            self._execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (str(e), time.time(), job_id)
+            )
+
+    def wait(self, job_id, timeout):
+        """Blocks until the job finishes or ``timeout`` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self._execute("SELECT status FROM jobs WHERE id = ?", (job_id,))
+            if not rows or rows[0][0] in ("done", "failed"):
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # Jobs run by this process notify; jobs run elsewhere are polled
+            with self.finished:
+                self.finished.wait(min(remaining, POLL_INTERVAL))
+
+    def get(self, job_id):
+        """Status, timings and (once finished) the result or error of a job, or None."""
+        rows = self._execute(
+            "SELECT id, kind, lane, status, result, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        job_id, kind, lane, status, result, error, created_at, started_at, finished_at = rows[0]
+        return {
+            "id": job_id,
+            "kind": kind,
+            "lane": lane,
+            "status": status,
+            "result": fast_json.loads(result) if result is not None else None,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at
+        }
+
+    def purge(self):
+        """Deletes finished jobs older than the retention period."""
+        self.last_purge = time.monotonic()
+        self._execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - self.retention,)
+        )
+
+    def queued(self):
+        """Number of jobs waiting to run, across all lanes and processes."""
+        return self._execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'")[0][0]
+
+    def stats(self):
+        queued = dict(self._execute("SELECT lane, COUNT(*) FROM jobs WHERE status = 'queued' GROUP BY lane"))
+        counts = dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {
+            "queued": {lane: queued.get(lane, 0) for lane in LANES},
+            "jobs": counts
+        }
@@ -0,0 +1,134 @@
+import argparse
+import io
+import os
+import zipfile
+import numpy as np
+from rollout_memo import model_version
+
+# Which implementation runs the PPO recovery policies: "numpy" (NumpyPolicy)
+# or "sb3" (stable-baselines3 PPO.predict)
+BACKENDS = ("numpy", "sb3")
+POLICY_BACKEND = os.environ.get("DEADLOCK_POLICY_BACKEND", "numpy")
+
+# Actor layers of a stable-baselines3 MlpPolicy, in order; Tanh between them
+ACTOR_LAYERS = ("mlp_extractor.policy_net.0", "mlp_extractor.policy_net.2", "action_net")
+
+
+def exported_path(model_path):
+    """Where the exported weights of a model zip live: ppo_x.zip -> ppo_x.policy.npz."""
+    root, _ = os.path.splitext(model_path)
+    return root + ".policy.npz"
+
+
+def read_actor_weights(model_path):
+    """
+    Reads the actor weights from a stable-baselines3 model zip.
+
+    Only needs torch (to unpickle policy.pth), not stable-baselines3 or gym.
+
+    Returns:
+        dict: ``<layer>.weight`` / ``<layer>.bias`` float32 arrays for ACTOR_LAYERS
+    """
+    import torch
+
+    with zipfile.ZipFile(model_path) as archive:
+        state = torch.load(io.BytesIO(archive.read("policy.pth")), map_location="cpu", weights_only=True)
+    weights = {}
+    for layer in ACTOR_LAYERS:
+        for param in ("weight", "bias"):
+            name = f"{layer}.{param}"
+            if name not in state:
+                raise ValueError(f"{model_path} is not an MlpPolicy with the default [64, 64] Tanh network")
+            weights[name] = state[name].numpy().astype(np.float32)
+    return weights
+
+
+def export_policy(model_path, output=None):
+    """
+    Writes the actor weights of a model zip to an .npz file, tagged with
+    the zip's version so a stale export is not used after retraining.
+
+    Returns:
+        str: Path of the .npz file
+    """
+    output = output or exported_path(model_path)
+    np.savez(output, version=model_version(model_path), **read_actor_weights(model_path))
+    return output
+
+
+class NumpyPolicy:
+    """
+    The action head of a stable-baselines3 MlpPolicy as plain float32 NumPy
+    matmuls, with the same ``predict`` interface as the PPO model.
+
+    Observations (one, or a batch) are cast to float32 like the model does;
+    there is no other preprocessing for Box observations. Deterministic
+    actions are the argmax of the logits; otherwise actions are sampled
+    from their softmax.
+    """
+
+    def __init__(self, weights, seed=None):
+        *hidden, output = [
+            (np.ascontiguousarray(weights[f"{layer}.weight"].T), weights[f"{layer}.bias"])
+            for layer in ACTOR_LAYERS
+        ]
+        self.hidden = hidden
+        self.output = output
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def load(cls, model_path):
+        """From the exported .npz next to a model zip if it is up to date, else from the zip itself."""
+        path = exported_path(model_path)
+        if os.path.exists(path):
+            with np.load(path) as weights:
+                if "version" in weights and str(weights["version"]) == model_version(model_path):
+                    return cls(dict(weights))
+        return cls(read_actor_weights(model_path))
+
+    def logits(self, obs):
+        x = np.asarray(obs, dtype=np.float32)
+        for weight, bias in self.hidden:
+            x = np.tanh(x @ weight + bias)
+        weight, bias = self.output
+        return x @ weight + bias
+
+    def predict(self, obs, deterministic=False):
+        logits = self.logits(obs)
+        if not deterministic:
+            # Gumbel-max: argmax of logits plus Gumbel noise samples from the softmax
+            logits = logits - np.log(-np.log(self.rng.random(logits.shape)))
+        return np.argmax(logits, axis=-1), None
+
+
+def load_policy(model_path, backend=None):
+    """
+    Loads a PPO recovery policy with the selected backend.
+
+    Args:
+        model_path: stable-baselines3 model zip
+        backend: "numpy" or "sb3"; defaults to DEADLOCK_POLICY_BACKEND
+
+    Returns:
+        An object with ``predict(obs, deterministic=False) -> (action, state)``
+    """
+    backend = backend or POLICY_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown policy backend: {backend}")
+    if backend == "numpy":
+        return NumpyPolicy.load(model_path)
+    from stable_baselines3 import PPO
+    return PPO.load(model_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export PPO recovery policies for NumpyPolicy")
+    parser.add_argument("models", nargs="*", default=["ppo_deadlock_multi_env.zip", "ppo_deadlock_recovery_single.zip"])
+    args = parser.parse_args()
+
+    for model_path in args.models:
+        print(f"{model_path} -> {export_policy(model_path)}")
+
+
+if __name__ == "__main__":
+    main()
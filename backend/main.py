@@ -1,42 +1,26 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from matrix import is_deadlocked
-from rag_wfg import run_deadlock_detection
+from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi.responses import JSONResponse
+from matrix import is_deadlocked, analyze_safety
+from rag_wfg import run_deadlock_detection, detect_wfg
+from binary_input import load_json, load_npz, load_raw, validate_arrays
+import fast_json
+from rollout_memo import RolloutMemo, model_version, state_key
+from lean_policy import load_policy
+from jobs import JobQueue, LANES
+from recovery_solver import solve_optimal, PlanPolicy
+from admission import (
+    Rejected, estimate_cost, keep_history, admit, admit_job, check_cost, check_body_size, deadline,
+    JOB_TIME_BUDGET, stats as admission_stats
+)
+from starlette.concurrency import run_in_threadpool
+import io
+from contextlib import redirect_stdout
 import numpy as np
-from stable_baselines3 import PPO
 import gym
-from env import DeadlockRecoveryEnv, DeadlockRecoveryEnvSingle
+from env import DeadlockRecoveryEnv, DeadlockRecoveryEnvSingle, check_int32_state
 import traceback
-from typing import List, Optional
 import json
 
-app = FastAPI()
-
-class MatrixInput(BaseModel):
-    allocation: List[List[int]]
-    request: List[List[int]]
-    available: List[int]
-
-class SimulationStep(BaseModel):
-    step: int
-    action: str
-    available: Optional[List[int]] = None
-    allocation: Optional[List[List[int]]] = None
-    request: Optional[List[List[int]]] = None
-    work: Optional[List[int]] = None
-    finish: List[bool]
-    result: Optional[str] = None
-    final_finish: Optional[List[bool]] = None
-
-class SimulationResult(BaseModel):
-    simulation_id: str
-    steps: List[SimulationStep]
-
-model = PPO.load("ppo_deadlock_multi_env")  # Load trained model
-
-
-
-
 app = FastAPI()
 
 # Print registered routes for debugging
@@ -45,200 +29,455 @@ async def startup_event():
     print("Registered routes:")
     for route in app.routes:
         print(f"{route.methods} {route.path}")
+    job_queue.start()
 
-class MatrixInput(BaseModel):
-    available: List[int]
-    allocation: List[List[int]]
-    request: List[List[int]]
-    simulation_id: str = "matrix_sim"
-
-class WFGInput(BaseModel):
-    available: List[int]
-    allocation: List[List[int]]
-    request: List[List[int]]
-    simulation_id: str = "wfg_sim"
-
-class SimulationStep(BaseModel):
-    step: int
-    action: str
-    available: Optional[List[int]] = None
-    allocation: Optional[List[List[int]]] = None
-    request: Optional[List[List[int]]] = None
-    work: Optional[List[int]] = None
-    finish: List[bool]
-    result: Optional[str] = None
-    final_finish: Optional[List[bool]] = None
-
-class SimulationResult(BaseModel):
-    simulation_id: str
-    steps: List[SimulationStep]
-    response: List[str]
-
-# Load the trained model for deadlock recovery
+# Load the trained model for deadlock recovery; DEADLOCK_POLICY_BACKEND picks
+# the NumPy forward pass (default) or stable-baselines3
 try:
-    model = PPO.load("ppo_deadlock_multi_env")
+    model = load_policy("ppo_deadlock_multi_env.zip")
+    model_multi_version = model_version("ppo_deadlock_multi_env.zip")
 except Exception as e:
     print(f"Error loading model: {e}")
     model = None
+    model_multi_version = None
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for large payloads such as recovery ``steps``.
+
+    Content is serialized in one orjson pass (NumPy arrays included) instead
+    of FastAPI walking every nested value with ``jsonable_encoder``.
+    """
+
+    def render(self, content):
+        return fast_json.dumps(content)
+
+def rejection(e):
+    """The HTTPException answering an admission control rejection."""
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
+async def read_body(http_request: Request):
+    """
+    Reads a request body, refusing it (413) past the size limit: before
+    reading when the length is declared, else as soon as the chunks read pass it.
+    """
+    try:
+        check_body_size(int(http_request.headers.get("content-length") or 0))
+        chunks = []
+        size = 0
+        async for chunk in http_request.stream():
+            size += len(chunk)
+            check_body_size(size)
+            chunks.append(chunk)
+    except Rejected as e:
+        raise rejection(e)
+    return b"".join(chunks)
+
+def json_input(default_simulation_id):
+    """
+    Builds a dependency that decodes a JSON detection body straight into
+    NumPy arrays and validates it once for whichever engine handles it.
+    """
+    async def read_json_input(http_request: Request):
+        body = await read_body(http_request)
+        try:
+            available, allocation, request, simulation_id = load_json(body)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return available, allocation, request, simulation_id or default_simulation_id
+    return read_json_input
+
+def detection_schema(default_simulation_id=None):
+    """JSON schema of a detection input, as read by load_json."""
+    counts = {"type": "array", "items": {"type": "integer", "minimum": 0}}
+    simulation_id = {"type": "string"}
+    if default_simulation_id:
+        simulation_id["default"] = default_simulation_id
+    return {
+        "type": "object",
+        "required": ["available", "allocation", "request"],
+        "properties": {
+            "available": counts,
+            "allocation": {"type": "array", "items": counts},
+            "request": {"type": "array", "items": counts},
+            "simulation_id": simulation_id
+        }
+    }
+
+def body_docs(content):
+    """
+    OpenAPI request body for endpoints that read the raw body themselves,
+    which FastAPI cannot infer. ``content`` maps media types to schemas.
+    """
+    return {"requestBody": {
+        "required": True,
+        "content": {media_type: {"schema": schema} for media_type, schema in content.items()}
+    }}
+
+def json_body_docs(default_simulation_id):
+    return body_docs({"application/json": detection_schema(default_simulation_id)})
+
+BINARY_BODY_DOCS = body_docs({
+    "application/octet-stream": {"type": "string", "format": "binary"},
+    "application/x-npz": {"type": "string", "format": "binary"}
+})
 
 @app.get("/")
 async def read_root():
     return {"message": "Hello World"}
 
-@app.post("/api/matrix")
-async def matrix_simulation(input_data: MatrixInput):
+def history_enabled(engine, allocation, request):
+    enabled = keep_history(engine, allocation, request)
+    if not enabled:
+        admission_stats.record("history_skipped")
+    return enabled
+
+def matrix_result(available, allocation, request, simulation_id, budget=None):
+    save_history = history_enabled("matrix", allocation, request)
+    report = analyze_safety(
+        available, allocation, request, simulation_id, save_history, validate=False, deadline=deadline(budget)
+    )
+    # The simulation this request recorded; reading the latest one back from
+    # the shared history could return another worker's run with the same id
+    return {
+        "deadlocked": report["deadlocked"],
+        "simulation": {"simulation_id": simulation_id, "steps": report["history"]} if save_history else None,
+        "safe_sequence": report["safe_sequence"],
+        "blocked": report["blocked"],
+        "extra_available": report["extra_available"],
+        "extra_available_exact": report["extra_available_exact"]
+    }
+
+def wfg_result(available, allocation, request, simulation_id, budget=None):
+    save_history = history_enabled("wfg", allocation, request)
+    result = detect_wfg(
+        available, allocation, request, simulation_id, save_history, validate=False, deadline=deadline(budget)
+    )
+    return {
+        "deadlocked": result["deadlocked"],
+        "cycle_nodes": list(result["cycle_nodes"]),
+        "simulation": {"simulation_id": simulation_id, "steps": result["history"]} if save_history else None
+    }
+
+async def run_detection(engine, run, available, allocation, request, simulation_id=None):
+    """
+    Admission control for a detection request. Depending on its estimated
+    cost the request is answered with ``run(available, allocation, request)``
+    within the time budget, queued as a job (202 with the job id), or
+    refused (413 too large, 429 job queue full). ``run`` executes in the
+    threadpool so the event loop keeps serving other requests meanwhile.
+    """
     try:
-        deadlocked = is_deadlocked(
-            input_data.available,
-            input_data.allocation,
-            input_data.request,
-            input_data.simulation_id
-        )
-        # Optionally, load the last simulation steps from file
-        with open("matrix_simulations.json", "r") as f:
-            simulations = [sim for sim in json.load(f) if sim["simulation_id"] == input_data.simulation_id]
-        return {
-            "deadlocked": deadlocked,
-            "simulation": simulations[-1] if simulations else None
-        }
+        mode = admit(estimate_cost(engine, allocation, request), job_queue.queued)
+        if mode == "job":
+            payload = {"available": available, "allocation": allocation, "request": request,
+                       "simulation_id": simulation_id}
+            job_id = job_queue.submit(engine, payload, "bulk")
+            return FastJSONResponse(
+                {"id": job_id, "status": "queued", "lane": "bulk"},
+                status_code=202, headers={"Location": f"/api/jobs/{job_id}"}
+            )
+    except Rejected as e:
+        raise rejection(e)
+
+    try:
+        return FastJSONResponse(await run_in_threadpool(run, available, allocation, request))
+    except TimeoutError:
+        admission_stats.record("timed_out")
+        raise HTTPException(status_code=503, detail="Time budget exceeded; submit large inputs to /api/jobs")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/wfg")
-async def wfg_simulation(input_data: WFGInput):
+@app.post("/api/matrix", response_class=FastJSONResponse, openapi_extra=json_body_docs("matrix_sim"))
+async def matrix_simulation(input_data=Depends(json_input("matrix_sim"))):
+    available, allocation, request, simulation_id = input_data
+    return await run_detection(
+        "matrix", lambda *arrays: matrix_result(*arrays, simulation_id),
+        available, allocation, request, simulation_id
+    )
+
+@app.post("/api/wfg", response_class=FastJSONResponse, openapi_extra=json_body_docs("wfg_sim"))
+async def wfg_simulation(input_data=Depends(json_input("wfg_sim"))):
+    available, allocation, request, simulation_id = input_data
+    return await run_detection(
+        "wfg", lambda *arrays: wfg_result(*arrays, simulation_id),
+        available, allocation, request, simulation_id
+    )
+
+async def read_binary_input(http_request: Request):
+    """Decodes an .npz (application/x-npz) or raw int32 (application/octet-stream) body."""
+    body = await read_body(http_request)
+    content_type = http_request.headers.get("content-type", "")
     try:
-        deadlocked, cycle_nodes, file_path = run_deadlock_detection(
-            input_data.available,
-            input_data.allocation,
-            input_data.request,
-            input_data.simulation_id
+        if "npz" in content_type:
+            return load_npz(body)
+        return load_raw(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/matrix/binary", response_class=FastJSONResponse, openapi_extra=BINARY_BODY_DOCS)
+async def matrix_binary(http_request: Request):
+    available, allocation, request = await read_binary_input(http_request)
+
+    def run(available, allocation, request):
+        return {
+            "deadlocked": is_deadlocked(
+                available, allocation, request, save_history=False, validate=False, deadline=deadline()
+            ),
+            "num_processes": allocation.shape[0],
+            "num_resources": allocation.shape[1]
+        }
+    return await run_detection("matrix", run, available, allocation, request)
+
+@app.post("/api/wfg/binary", response_class=FastJSONResponse, openapi_extra=BINARY_BODY_DOCS)
+async def wfg_binary(http_request: Request):
+    available, allocation, request = await read_binary_input(http_request)
+
+    def run(available, allocation, request):
+        deadlocked, cycle_nodes, _ = run_deadlock_detection(
+            available, allocation, request, save_history=False, validate=False, deadline=deadline()
         )
-        # Optionally, load the last simulation steps from file
-        with open("deadlock_simulations.json", "r") as f:
-            simulations = [sim for sim in json.load(f) if sim["simulation_id"] == input_data.simulation_id]
         return {
             "deadlocked": deadlocked,
             "cycle_nodes": list(cycle_nodes),
-            "simulation": simulations[-1] if simulations else None
+            "num_processes": allocation.shape[0],
+            "num_resources": allocation.shape[1]
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_detection("wfg", run, available, allocation, request)
 
 # Load the trained model for deadlock recovery
 try:
-    model_single = PPO.load("ppo_deadlock_recovery_single.zip")
+    model_single = load_policy("ppo_deadlock_recovery_single.zip")
+    model_single_version = model_version("ppo_deadlock_recovery_single.zip")
 except Exception as e:
     print(f"Error loading model: {e}")
     model_single = None
+    model_single_version = None
+
+# Shared across requests; entries are keyed by model version and state
+rollout_memo = RolloutMemo(maxsize=4096)
+
+STEP_FIELDS = ("available", "allocation", "request", "work", "result", "final_finish")
+
+def simulation_step(step, action, finish, **fields):
+    """Builds a SimulationStep as a plain dict, with every optional field present."""
+    return {"step": step, "action": action, **dict.fromkeys(STEP_FIELDS), "finish": finish, **fields}
 
-@app.post("/api/deadlock_recovery_wsg")
-def deadlock_recovery_wsg(wsg_input: WFGInput):
-    allocation = np.array(wsg_input.allocation)
-    request = np.array(wsg_input.request)
-    available = np.array(wsg_input.available)
+def run_recovery(policy, allocation, request, available, simulation_id, version=None, memo=None):
+    """
+    Rolls the recovery policy out on DeadlockRecoveryEnvSingle and returns a
+    SimulationResult payload with a step and a rendered report per step.
 
+    With a memo and a model version, states already seen (in this rollout or
+    an earlier one) reuse the stored action and deadlock flag instead of
+    running the policy and the safety check again. The policy then acts
+    deterministically, so the output does not depend on which request
+    first reached a state.
+    """
     num_processes = len(allocation)
-    num_resources=len(available)
+    num_resources = len(available)
     env = DeadlockRecoveryEnvSingle(num_processes=num_processes, num_resources=num_resources)
     obs = env.reset(allocation=allocation, request=request, available=available)
+
     steps = []
     step_count = 0
     done = False
     responses = []
+
     while not done:
-        # Capture the render output
-        import io
-        import sys
-        old_stdout = sys.stdout
-        sys.stdout = buffer = io.StringIO()
-        env.render()
-        sys.stdout = old_stdout
-        render_output = buffer.getvalue()
-        responses.append(render_output)
-
-        step_info = SimulationStep(
-            step=step_count,
-            action=f"Step {step_count} executed",
-            allocation=env.allocation.tolist(),
-            request=env.request.tolist(),
-            available=env.available.tolist(),
-            finish=[bool(np.all(env.request[i] == 0)) for i in range(env.num_processes)]
-        )
-        steps.append(step_info)
+        cached = None
+        if memo is not None and version is not None:
+            key = state_key(version, env.allocation, env.request, env.available)
+            cached = memo.get(key)
+            if cached is not None:
+                action, deadlocked = cached
+                env.set_deadlocked(deadlocked)
 
-        action, _ = model_single.predict(obs)
+        # Capture the render output
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            env.render()
+        responses.append(buffer.getvalue())
+
+        steps.append(simulation_step(
+            step_count,
+            f"Step {step_count} executed",
+            allocation=env.allocation.copy(),
+            request=env.request.copy(),
+            available=env.available.copy(),
+            finish=np.all(env.request == 0, axis=1)
+        ))
+
+        if cached is None:
+            # Memoized actions are replayed for every later request reaching the
+            # same state, so they must not depend on which request sampled them
+            action, _ = policy.predict(obs, deterministic=memo is not None and version is not None)
+            if memo is not None and version is not None:
+                memo.put(key, action, env._is_deadlocked())
         obs, reward, done, _ = env.step(action)
         step_count += 1
 
-    steps.append(SimulationStep(
-        step=step_count,
-        action="Deadlock Check Completed",
+    finish = np.all(env.request == 0, axis=1)
+    steps.append(simulation_step(
+        step_count,
+        "Deadlock Check Completed",
         result="No Deadlock" if not env._is_deadlocked() else "Deadlock Detected",
-        final_finish=[bool(np.all(env.request[i] == 0)) for i in range(env.num_processes)],
-        finish=[bool(np.all(env.request[i] == 0)) for i in range(env.num_processes)]
+        final_finish=finish,
+        finish=finish
     ))
 
-    return SimulationResult(
-        simulation_id="recorvery_sim_single",
-        steps=steps,
-        response=responses
-    )
-
+    return {
+        "simulation_id": simulation_id,
+        "steps": steps,
+        "response": responses
+    }
 
+RECOVERY_STRATEGIES = ("ppo", "optimal")
 
+def check_recovery_state(available, allocation, request):
+    """Rejects (422) states that would overflow the recovery envs' int32 buffer."""
+    try:
+        check_int32_state(allocation, request, available)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def check_strategy(strategy):
+    if strategy not in RECOVERY_STRATEGIES:
+        raise HTTPException(status_code=422, detail=f"Unknown strategy: {strategy}")
+
+def optimal_recovery(allocation, request, available, simulation_id):
+    """
+    Replays the cheapest recovery plan found by the exact solver through
+    run_recovery, so the payload matches the PPO one, plus the plan's penalty.
+    Systems over the solver's size cap are rejected with 413, searches
+    over the time budget with 503.
+    """
+    try:
+        plan = solve_optimal(allocation, request, available, deadline=deadline())
+    except ValueError as e:
+        admission_stats.record("rejected_too_large")
+        raise HTTPException(status_code=413, detail=str(e))
+    except TimeoutError:
+        admission_stats.record("timed_out")
+        raise HTTPException(status_code=503, detail="Time budget exceeded")
+    result = run_recovery(PlanPolicy(plan["actions"]), allocation, request, available, simulation_id)
+    result["penalty"] = plan["penalty"]
+    return result
+
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "rollout_memo": rollout_memo.stats(),
+        "jobs": job_queue.stats(),
+        "admission": admission_stats.stats()
+    }
+
+@app.post("/api/deadlock_recovery_wsg", response_class=FastJSONResponse, openapi_extra=json_body_docs("wfg_sim"))
+def deadlock_recovery_wsg(wsg_input=Depends(json_input("wfg_sim")), strategy: str = "ppo"):
+    available, allocation, request, _ = wsg_input
+    check_recovery_state(available, allocation, request)
+    if strategy == "optimal":
+        return FastJSONResponse(optimal_recovery(allocation, request, available, "recorvery_sim_single"))
+    check_strategy(strategy)
+    return FastJSONResponse(
+        run_recovery(
+            model_single, allocation, request, available, "recorvery_sim_single",
+            version=model_single_version, memo=rollout_memo
+        )
+    )
 
+@app.post("/api/deadlock_recovery", response_class=FastJSONResponse, openapi_extra=json_body_docs("matrix_sim"))
+def deadlock_recovery(matrix_input=Depends(json_input("matrix_sim")), strategy: str = "ppo"):
+    available, allocation, request, _ = matrix_input
+    check_recovery_state(available, allocation, request)
+    if strategy == "optimal":
+        return FastJSONResponse(optimal_recovery(allocation, request, available, "recorvery_sim"))
+    check_strategy(strategy)
+    return FastJSONResponse(
+        run_recovery(
+            model, allocation, request, available, "recorvery_sim",
+            version=model_multi_version, memo=rollout_memo
+        )
+    )
 
-@app.post("/api/deadlock_recovery")
-def deadlock_recovery(matrix_input: MatrixInput):
-    allocation = np.array(matrix_input.allocation)
-    request = np.array(matrix_input.request)
-    available = np.array(matrix_input.available)
+# Jobs: the same engines, run in the background for large inputs
+JOB_KINDS = {
+    "matrix": ("matrix_sim", matrix_result),
+    "wfg": ("wfg_sim", wfg_result),
+    "deadlock_recovery": ("matrix_sim", lambda available, allocation, request, _, budget=None: run_recovery(
+        model, allocation, request, available, "recorvery_sim",
+        version=model_multi_version, memo=rollout_memo
+    )),
+    "deadlock_recovery_wsg": ("wfg_sim", lambda available, allocation, request, _, budget=None: run_recovery(
+        model_single, allocation, request, available, "recorvery_sim_single",
+        version=model_single_version, memo=rollout_memo
+    ))
+}
 
-    num_processes = len(allocation)
-    num_resources=len(available)
-    env = DeadlockRecoveryEnvSingle(num_processes=num_processes, num_resources=num_resources)
-    obs = env.reset(allocation=allocation, request=request, available=available)
+# Detection inputs with more cells than this go to the bulk lane by default
+BULK_LANE_CELLS = 250_000
 
-    steps = []
-    step_count = 0
-    done = False
-    responses = []
+def job_handler(kind):
+    default_simulation_id, run = JOB_KINDS[kind]
 
-    while not done:
-        # Capture the render output
-        import io
-        import sys
-        old_stdout = sys.stdout
-        sys.stdout = buffer = io.StringIO()
-        env.render()
-        sys.stdout = old_stdout
-        render_output = buffer.getvalue()
-        responses.append(render_output)
-
-        step_info = SimulationStep(
-            step=step_count,
-            action=f"Step {step_count} executed",
-            allocation=env.allocation.tolist(),
-            request=env.request.tolist(),
-            available=env.available.tolist(),
-            finish=[bool(np.all(env.request[i] == 0)) for i in range(env.num_processes)]
+    def handle(payload):
+        available, allocation, request = validate_arrays(
+            payload["available"], payload["allocation"], payload["request"]
         )
-        steps.append(step_info)
-
-        action, _ = model.predict(obs)
-        obs, reward, done, _ = env.step(action)
-        step_count += 1
-
-    steps.append(SimulationStep(
-        step=step_count,
-        action="Deadlock Check Completed",
-        result="No Deadlock" if not env._is_deadlocked() else "Deadlock Detected",
-        final_finish=[bool(np.all(env.request[i] == 0)) for i in range(env.num_processes)],
-        finish=[bool(np.all(env.request[i] == 0)) for i in range(env.num_processes)]
-    ))
-
-    return SimulationResult(
-        simulation_id="recorvery_sim",
-        steps=steps,
-        response=responses
-    )
\ No newline at end of file
+        simulation_id = payload.get("simulation_id") or default_simulation_id
+        return run(available, allocation, request, simulation_id, budget=JOB_TIME_BUDGET)
+    return handle
+
+# Worker threads start per server process (after any fork), on startup or first submit
+job_queue = JobQueue()
+for kind in JOB_KINDS:
+    job_queue.register(kind, job_handler(kind))
+
+def default_lane(kind, allocation):
+    if kind.startswith("deadlock_recovery") or allocation.size > BULK_LANE_CELLS:
+        return "bulk"
+    return "interactive"
+
+@app.post("/api/jobs", status_code=202, openapi_extra=body_docs({"application/json": {
+    "type": "object",
+    "required": ["kind", "input"],
+    "properties": {
+        "kind": {"type": "string", "enum": list(JOB_KINDS)},
+        "input": detection_schema(),
+        "priority": {"type": "string", "enum": list(LANES)}
+    }
+}}))
+async def submit_job(http_request: Request):
+    """
+    Queues a detection or recovery run. The body is
+    {"kind": ..., "input": {...}, "priority": "interactive" | "bulk" (optional)}.
+    """
+    body = await read_body(http_request)
+    try:
+        body = fast_json.loads(body)
+        kind = body["kind"]
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        payload = body["input"]
+        _, allocation, request = validate_arrays(payload["available"], payload["allocation"], payload["request"])
+        check_cost(estimate_cost(kind, allocation, request))
+        if kind.startswith("deadlock_recovery"):
+            check_int32_state(allocation, request, payload["available"])
+        admit_job(job_queue.queued())
+        lane = body.get("priority") or default_lane(kind, allocation)
+        job_id = job_queue.submit(kind, payload, lane)
+    except Rejected as e:
+        raise rejection(e)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"id": job_id, "status": "queued", "lane": lane}
+
+@app.get("/api/jobs/{job_id}", response_class=FastJSONResponse)
+async def get_job(job_id: str, wait: float = 0):
+    """Job status and result. With ``wait``, long-polls up to that many seconds (max 30) for completion."""
+    if wait > 0:
+        await run_in_threadpool(job_queue.wait, job_id, min(wait, 30))
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job)
@@ -1,7 +1,18 @@
-import json
-import os
+import numpy as np
+from binary_input import validate_arrays
+from history import MATRIX_HISTORY
+from admission import check_deadline
 
-def is_deadlocked(available, allocation, request, simulation_id="matrix_sim"):
+# Rows checked per vectorized step of the safety loop
+SWEEP_WINDOW = 2048
+
+# Limits of the exact extra_available search, which visits every subset of
+# the blocked processes: above either, the greedy bound is returned instead
+EXTRA_EXACT_MAX_PROCESSES = 10
+EXTRA_EXACT_MAX_NEEDS = 256  # Candidate needs kept per subset
+
+def is_deadlocked(available, allocation, request, simulation_id="matrix_sim", save_history=True, validate=True,
+                  deadline=None):
     """
     Implements the Banker's algorithm for deadlock detection.
 
@@ -10,90 +21,237 @@ def is_deadlocked(available, allocation, request, simulation_id="matrix_sim"):
         allocation: Matrix of current resource allocation to processes
         request: Matrix of resource requests from processes
         simulation_id: ID for saving simulation history
+        save_history: Record the steps and append them to the history file
+        validate: Validate the inputs; callers that already ran validate_arrays can skip it
+        deadline: time.monotonic() value after which to stop with TimeoutError (None: no limit)
 
     Returns:
         bool: True if deadlock detected, False otherwise
     """
-    # Input validation
-    if not available or not allocation or not request:
-        raise ValueError("Input arrays cannot be empty")
+    report = analyze_safety(available, allocation, request, simulation_id, save_history, validate, deadline)
+    return report["deadlocked"]
+
+def analyze_safety(available, allocation, request, simulation_id="matrix_sim", save_history=True, validate=True,
+                   deadline=None):
+    """
+    Runs the Banker's algorithm and reports why the state is or is not safe.
+
+    Takes the same arguments as is_deadlocked.
+
+    Returns:
+        dict: With keys
+            deadlocked: True if some process can never finish
+            history: The recorded steps, or None when save_history is off
+            safe_sequence: Processes in the order they can finish; a complete
+                safe ordering when the state is not deadlocked
+            blocked: For each process that cannot finish, its per-resource
+                shortfall (request - work, clipped at 0) once every other
+                process that can finish has released its resources
+            extra_available: Extra resources that make the state safe if
+                added to available, with the smallest total when
+                extra_available_exact is set
+            extra_available_exact: False when the exact search is too
+                large (see EXTRA_EXACT_MAX_PROCESSES); the vector is then found by repeatedly topping up the blocked process
+                with the smallest total shortfall, which is sufficient but
+                not necessarily the smallest
+    """
+    # Input validation; NumPy inputs (e.g. memory-mapped files) are not copied
+    if validate:
+        available, allocation, request = validate_arrays(available, allocation, request)
 
     n = len(allocation)  # Number of processes
-    m = len(available)   # Number of resource types
 
-    # Validate dimensions
-    if any(len(row) != m for row in allocation) or any(len(row) != m for row in request):
-        raise ValueError("Inconsistent dimensions in input matrices")
+    work = available.astype(np.int64)  # Available resources for allocation
+    finish = np.zeros(n, dtype=bool)   # Track which processes can complete
+    sequence = _sweep(work, allocation, request, finish, deadline)
 
-    work = available.copy()  # Available resources for allocation
-    finish = [False] * n     # Track which processes can complete
-    history = []
+    # Deadlock exists if any process couldn't finish
+    deadlocked = not finish.all()
+    blocked = np.flatnonzero(~finish)
+    shortfall = np.maximum(request[blocked] - work, 0)
 
-    # Record initial state
-    history.append({
-        "step": 0,
-        "action": "Initial State",
-        "available": available,
-        "allocation": allocation,
-        "request": request,
-        "finish": finish.copy()
-    })
+    extra = np.zeros_like(work)
+    exact = True
+    if deadlocked:
+        topped_up = work.copy()
+        topped_finish = finish.copy()
+        while not topped_finish.all():
+            stuck = np.flatnonzero(~topped_finish)
+            missing = np.maximum(request[stuck] - topped_up, 0)
+            needed = missing[np.argmin(missing.sum(axis=1))]
+            extra += needed
+            topped_up += needed
+            _sweep(topped_up, allocation, request, topped_finish, deadline)
+
+        minimum = None
+        if len(blocked) <= EXTRA_EXACT_MAX_PROCESSES:
+            minimum = _minimum_extra(work, allocation, request, blocked, int(extra.sum()), deadline)
+        if minimum is None:
+            exact = False
+        else:
+            extra = minimum
+
+    history = None
+    if save_history:
+        history = _build_history(available, allocation, request, sequence, deadlocked)
+        save_simulation(history, simulation_id)
+
+    return {
+        "deadlocked": deadlocked,
+        "history": history,
+        "safe_sequence": sequence,
+        "blocked": [
+            {"process": int(i), "shortfall": row.tolist()}
+            for i, row in zip(blocked, shortfall)
+        ],
+        "extra_available": extra.tolist(),
+        "extra_available_exact": exact
+    }
+
+def _minimum_extra(work, allocation, request, blocked, bound, deadline=None):
+    """
+    Smallest-total extra available that lets every blocked process finish,
+    given the ``work`` left once all the others have finished.
+
+    For a fixed finish order, the extra needed is, per resource, the largest
+    shortfall of any process when its turn comes. The work at a turn only
+    depends on which processes finished before, so the search runs over
+    subsets of the blocked processes, keeping per subset only the needs
+    that no other need is at most in every resource, and none whose total
+    is already above ``bound`` (the greedy answer).
+
+    Returns:
+        The extra vector, or None if a subset had more than
+        EXTRA_EXACT_MAX_NEEDS candidate needs
+    """
+    k = len(blocked)
+    full = (1 << k) - 1
+    works = {0: work}
+    candidates = {0: [np.zeros((1, len(work)), dtype=work.dtype)]}
+    # Adding a process only sets bits, so every subset comes after its own subsets
+    for done in range(full + 1):
+        if done not in candidates:
+            continue
+        check_deadline(deadline)
+        needs = _least(np.concatenate(candidates.pop(done)))
+        if len(needs) > EXTRA_EXACT_MAX_NEEDS:
+            return None
+        if done == full:
+            return needs[np.argmin(needs.sum(axis=1))]
+        current = works.pop(done)
+        for i in range(k):
+            bit = 1 << i
+            if done & bit:
+                continue
+            grown = np.maximum(needs, np.maximum(request[blocked[i]] - current, 0))
+            grown = grown[grown.sum(axis=1) <= bound]
+            if len(grown):
+                candidates.setdefault(done | bit, []).append(grown)
+                works.setdefault(done | bit, current + allocation[blocked[i]])
+    return None
+
+def _least(needs):
+    """The rows of ``needs`` that no other row is at most in every column."""
+    needs = np.unique(needs, axis=0)
+    at_most = np.all(needs[:, None, :] <= needs[None, :, :], axis=2)
+    np.fill_diagonal(at_most, False)
+    return needs[~at_most.any(axis=0)]
+
+def _sweep(work, allocation, request, finish, deadline=None):
+    """
+    Finishes every process that can finish, updating ``work`` and ``finish`` in place.
+
+    Processes are picked in exactly the order of the classic loop (check
+    P0..Pn-1 one at a time, repeat while any finished), but each pass is
+    vectorized over windows of rows: all processes in the window that can
+    run on the current work are found at once, and the window only restarts
+    early when releasing one of them lets a process in between them run too.
 
-    step = 1
+    Returns:
+        list: Indices of the processes that finished, in order
+    """
+    n = len(finish)
+    sequence = []
     while True:
         made_progress = False
-        for i in range(n):
-            # Check if process i can complete:
-            # 1. Not already marked as finished
-            # 2. Its resource requests can be satisfied
-            if not finish[i] and all(request[i][j] <= work[j] for j in range(m)):
-                # Release all resources held by process i
-                for j in range(m):
-                    work[j] += allocation[i][j]
-                finish[i] = True
-                made_progress = True
-
-                history.append({
-                    "step": step,
-                    "action": f"Process P{i} can finish. Resources released.",
-                    "work": work.copy(),
-                    "finish": finish.copy()
-                })
-                step += 1
-
-        # If no process could make progress in this iteration, exit loop
+        start = 0
+        while start < n:
+            check_deadline(deadline)
+            end = min(n, start + SWEEP_WINDOW)
+            pending = np.flatnonzero(~finish[start:end]) + start
+            can_run = np.all(request[pending] <= work, axis=1)
+            ready = pending[can_run]
+            if ready.size == 0:
+                start = end
+                continue
+
+            waiting = pending[~can_run]
+            unblocked = np.zeros(waiting.size, dtype=bool)
+            if waiting.size:
+                # Work seen by each waiting process when the loop reaches it, i.e.
+                # after every ready process before it has released its resources
+                released = work + np.cumsum(allocation[ready], axis=0)
+                before = np.searchsorted(ready, waiting)
+                seen = np.where((before == 0)[:, None], work, released[np.maximum(before - 1, 0)])
+                unblocked = np.all(request[waiting] <= seen, axis=1)
+
+            if unblocked.any():
+                first = waiting[np.argmax(unblocked)]
+                taken = np.append(ready[ready < first], first)
+                start = first + 1
+            else:
+                taken = ready
+                start = end
+
+            finish[taken] = True
+            work += allocation[taken].sum(axis=0)
+            sequence.extend(taken.tolist())
+            made_progress = True
+
+        # If no process could make progress in this pass, stop
         if not made_progress:
-            break
+            return sequence
+
+def _build_history(available, allocation, request, sequence, deadlocked):
+    """Step-by-step record of a safety check, as replayed by the frontend."""
+    n = len(allocation)
+    finish = [False] * n
+    history = [{
+        "step": 0,
+        "action": "Initial State",
+        "available": available.tolist(),
+        "allocation": allocation.tolist(),
+        "request": request.tolist(),
+        "finish": finish.copy()
+    }]
+
+    works = available.astype(np.int64) + np.cumsum(allocation[sequence], axis=0)
+    for step, (i, work) in enumerate(zip(sequence, works), start=1):
+        finish[i] = True
+        history.append({
+            "step": step,
+            "action": f"Process P{i} can finish. Resources released.",
+            "work": work.tolist(),
+            "finish": finish.copy()
+        })
 
-    # Deadlock exists if any process couldn't finish
-    deadlocked = any(not f for f in finish)
     history.append({
-        "step": step,
+        "step": len(sequence) + 1,
         "action": "Deadlock Check Completed",
         "result": "Deadlock Detected" if deadlocked else "No Deadlock",
         "final_finish": finish
     })
-
-    save_simulation(history, simulation_id)
-    return deadlocked
+    return history
 
 def save_simulation(history, simulation_id):
     """
-    Saves simulation history to a JSON file.
+    Appends simulation history to the matrix history store.
 
     Args:
         history: List of simulation steps
         simulation_id: Unique identifier for this simulation
+
+    Returns:
+        str: Path of the history segment the simulation was written to
     """
-    filename = "matrix_simulations.json"
-    data = []
-    if os.path.exists(filename):
-        with open(filename, "r") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                data = []
-
-    data.append({"simulation_id": simulation_id, "steps": history})
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=4)
+    return MATRIX_HISTORY.append({"simulation_id": simulation_id, "steps": history})
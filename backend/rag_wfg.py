@@ -1,32 +1,44 @@
-import json
-import os
 from collections import defaultdict
+import numpy as np
+from binary_input import validate_arrays
+from history import WFG_HISTORY
+from admission import check_deadline
+
+# Loop iterations between time budget checks
+DEADLINE_CHECK_INTERVAL = 1024
 
 class DeadlockDetector:
-    def __init__(self):
+    def __init__(self, record_history=True, deadline=None):
         self.history = []
+        self.record_history = record_history
+        self.deadline = deadline
+
+    def _record(self, action, graph):
+        if self.record_history:
+            self.history.append({
+                "step": len(self.history),
+                "action": action,
+                "graph": {k: list(v) for k, v in graph.items()}
+            })
 
     def build_rag(self, allocation, request, num_processes, num_resources):
         rag = defaultdict(set)
-        step = {"step": 0, "action": "Initial Resource Allocation", "graph": {}}
-
-        for i in range(num_processes):
-            for j in range(num_resources):
-                if allocation[i][j] > 0:
-                    rag[f"R{j}"].add(f"P{i}")
-
-        step["graph"] = {k: list(v) for k, v in rag.items()}
-        self.history.append(step)
-
-        for i in range(num_processes):
-            for j in range(num_resources):
-                if request[i][j] > 0:
-                    rag[f"P{i}"].add(f"R{j}")
-                    self.history.append({
-                        "step": len(self.history),
-                        "action": f"P{i} requested R{j}",
-                        "graph": {k: list(v) for k, v in rag.items()}
-                    })
+        allocation = np.asarray(allocation)[:num_processes, :num_resources]
+        request = np.asarray(request)[:num_processes, :num_resources]
+
+        # Only visit non-zero cells, in the same row-major order as a nested loop
+        for count, (i, j) in enumerate(zip(*np.nonzero(allocation > 0))):
+            if count % DEADLINE_CHECK_INTERVAL == 0:
+                check_deadline(self.deadline)
+            rag[f"R{j}"].add(f"P{i}")
+
+        self._record("Initial Resource Allocation", rag)
+
+        for count, (i, j) in enumerate(zip(*np.nonzero(request > 0))):
+            if count % DEADLINE_CHECK_INTERVAL == 0:
+                check_deadline(self.deadline)
+            rag[f"P{i}"].add(f"R{j}")
+            self._record(f"P{i} requested R{j}", rag)
 
         return rag
 
@@ -34,6 +46,7 @@ class DeadlockDetector:
         wfg = defaultdict(set)
 
         for process in rag:
+            check_deadline(self.deadline)
             if process.startswith("P"):
                 for resource in rag[process]:
                     if resource.startswith("R"):
@@ -41,74 +54,90 @@ class DeadlockDetector:
                             if holder != process:
                                 wfg[process].add(holder)
 
-        self.history.append({
-            "step": len(self.history),
-            "action": "Converted RAG to WFG",
-            "graph": {k: list(v) for k, v in wfg.items()}
-        })
+        self._record("Converted RAG to WFG", wfg)
 
         return wfg
 
     def detect_cycle(self, wfg):
         visited = set()
         rec_stack = []
+        on_stack = set()
         cycle_nodes = set()
-
-        def dfs(process):
-            visited.add(process)
-            rec_stack.append(process)
-            for neighbor in wfg.get(process, []):
-                if neighbor not in visited:
-                    if dfs(neighbor):
-                        return True
-                elif neighbor in rec_stack:
-                    cycle_start = rec_stack.index(neighbor)
-                    cycle_nodes.update(rec_stack[cycle_start:])
-                    return True
-            rec_stack.pop()
-            return False
-
-        for process in wfg:
-            if process not in visited:
-                if dfs(process):
+        steps = 0
+
+        # Depth-first search with an explicit stack, so long wait chains
+        # cannot hit Python's recursion limit
+        for root in wfg:
+            if root in visited:
+                continue
+            visited.add(root)
+            rec_stack.append(root)
+            on_stack.add(root)
+            neighbors = [iter(wfg.get(root, []))]
+
+            while neighbors:
+                steps += 1
+                if steps % DEADLINE_CHECK_INTERVAL == 0:
+                    check_deadline(self.deadline)
+                for neighbor in neighbors[-1]:
+                    if neighbor not in visited:
+                        visited.add(neighbor)
+                        rec_stack.append(neighbor)
+                        on_stack.add(neighbor)
+                        neighbors.append(iter(wfg.get(neighbor, [])))
+                        break
+                    if neighbor in on_stack:
+                        cycle_start = rec_stack.index(neighbor)
+                        cycle_nodes.update(rec_stack[cycle_start:])
+                        break
+                else:
+                    on_stack.discard(rec_stack.pop())
+                    neighbors.pop()
+                    continue
+                if cycle_nodes:
                     break
 
-        self.history.append({
-            "step": len(self.history),
-            "action": (
-                f"Cycle Detected: {' -> '.join(cycle_nodes)}"
-                if cycle_nodes else "No cycle found"
-            ),
-            "graph": {k: list(v) for k, v in wfg.items()}
-        })
+            if cycle_nodes:
+                break
+
+        self._record(
+            f"Cycle Detected: {' -> '.join(cycle_nodes)}"
+            if cycle_nodes else "No cycle found",
+            wfg
+        )
 
         return bool(cycle_nodes), cycle_nodes
 
     def save_to_file(self, simulation_id):
-        data = []
-        filename = "deadlock_simulations.json"
-        if os.path.exists(filename):
-            with open(filename, "r") as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError:
-                    data = []
-
-        data.append({"simulation_id": simulation_id, "steps": self.history})
-
-        with open(filename, "w") as f:
-            json.dump(data, f, indent=4)
-
-        return filename
-
-def run_deadlock_detection(available, allocation, request, simulation_id="sim"):
-    detector = DeadlockDetector()
+        return WFG_HISTORY.append({"simulation_id": simulation_id, "steps": self.history})
+
+def detect_wfg(available, allocation, request, simulation_id="sim", save_history=True, validate=True,
+               deadline=None):
+    """
+    Runs RAG -> WFG cycle detection and returns a dict with ``deadlocked``,
+    ``cycle_nodes``, the recorded ``history`` steps and the ``path`` they
+    were saved to (both None when save_history is off). Past ``deadline``
+    (a time.monotonic() value) it stops with TimeoutError.
+    """
+    if validate:
+        available, allocation, request = validate_arrays(available, allocation, request)
+    detector = DeadlockDetector(record_history=save_history, deadline=deadline)
     num_processes = len(allocation)
     num_resources = len(available)
 
     rag = detector.build_rag(allocation, request, num_processes, num_resources)
     wfg = detector.convert_rag_to_wfg(rag)
     deadlocked, cycle_nodes = detector.detect_cycle(wfg)
-    path = detector.save_to_file(simulation_id)
-
-    return deadlocked, cycle_nodes, path
+    path = detector.save_to_file(simulation_id) if save_history else None
+
+    return {
+        "deadlocked": deadlocked,
+        "cycle_nodes": cycle_nodes,
+        "history": detector.history if save_history else None,
+        "path": path
+    }
+
+def run_deadlock_detection(available, allocation, request, simulation_id="sim", save_history=True, validate=True,
+                           deadline=None):
+    result = detect_wfg(available, allocation, request, simulation_id, save_history, validate, deadline)
+    return result["deadlocked"], result["cycle_nodes"], result["path"]
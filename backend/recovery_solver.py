@@ -0,0 +1,130 @@
+import heapq
+import itertools
+import numpy as np
+from admission import check_deadline
+
+# Penalties of DeadlockRecoveryEnvSingle.step for actions taken in a deadlocked state
+NOOP_PENALTY = 100
+KILL_PENALTY = 10
+PREEMPT_PENALTY = 5
+
+# Largest system the exact solver accepts; the search space grows as 3^processes
+OPTIMAL_MAX_PROCESSES = 10
+
+# Per-process status reachable through the env's actions
+RUNNING, PREEMPTED, KILLED = 0, 1, 2
+
+
+def _deadlocked(available, allocation, request):
+    """Vectorized safety check: True if some process can never finish."""
+    work = available.astype(np.int64)
+    finish = np.zeros(len(allocation), dtype=bool)
+    while True:
+        runnable = ~finish & np.all(request <= work, axis=1)
+        if not runnable.any():
+            return not finish.all()
+        work += allocation[runnable].sum(axis=0)
+        finish |= runnable
+
+
+def _apply(status, allocation, request, available):
+    """State of the env after the kills and preemptions described by ``status``."""
+    reclaimed = status != RUNNING
+    return (
+        available + allocation[reclaimed].sum(axis=0),
+        np.where(reclaimed[:, None], 0, allocation),
+        np.where((status == KILLED)[:, None], 0, request)
+    )
+
+
+def solve_optimal(allocation, request, available, max_processes=OPTIMAL_MAX_PROCESSES, deadline=None):
+    """
+    Finds the cheapest sequence of DeadlockRecoveryEnvSingle actions that
+    reaches a safe state, by A* over per-process statuses.
+
+    Killing releases a process's allocation and drops its request; preempting
+    releases its allocation but keeps the request. So every reachable state
+    is described by whether each process is running, preempted or killed,
+    and the order of actions does not matter. Actions that cannot change the
+    state (preempting a process that holds nothing, anything on a killed
+    process) are pruned. Safety checks are memoized per state.
+
+    Args:
+        allocation: Matrix of current resource allocation to processes
+        request: Matrix of resource requests from processes
+        available: Vector of available resources
+        max_processes: Refuse larger systems
+        deadline: time.monotonic() value after which to stop with TimeoutError (None: no limit)
+
+    Returns:
+        dict: ``actions`` (env action ids, in order), ``penalty`` (the sum of
+        env penalties those actions incur) and ``expanded`` (states searched)
+    """
+    allocation = np.asarray(allocation)
+    request = np.asarray(request)
+    available = np.asarray(available)
+    n = len(allocation)
+    if n > max_processes:
+        raise ValueError(f"The optimal solver supports at most {max_processes} processes, got {n}")
+
+    safe_cache = {}
+
+    def is_safe(status):
+        key = status.tobytes()
+        if key not in safe_cache:
+            safe_cache[key] = not _deadlocked(*_apply(status, allocation, request, available))
+        return safe_cache[key]
+
+    holds = allocation.any(axis=1)
+    start = np.zeros(n, dtype=np.int8)
+    counter = itertools.count()
+    # Any deadlocked state needs at least one more action, so this stays admissible
+    heuristic = lambda status: 0 if is_safe(status) else PREEMPT_PENALTY
+    frontier = [(heuristic(start), next(counter), 0, start.tobytes(), [])]
+    best = {start.tobytes(): 0}
+    expanded = 0
+
+    while frontier:
+        _, _, cost, key, actions = heapq.heappop(frontier)
+        if cost > best.get(key, cost):
+            continue
+        check_deadline(deadline)
+        status = np.frombuffer(key, dtype=np.int8)
+        expanded += 1
+        if is_safe(status):
+            return {"actions": actions, "penalty": cost, "expanded": expanded}
+
+        for pid in range(n):
+            if status[pid] == KILLED:
+                continue
+            moves = [(KILLED, pid + 1, KILL_PENALTY)]
+            if status[pid] == RUNNING and holds[pid]:
+                moves.append((PREEMPTED, n + 1 + pid, PREEMPT_PENALTY))
+            for new_status, action, penalty in moves:
+                child = status.copy()
+                child[pid] = new_status
+                child_key = child.tobytes()
+                child_cost = cost + penalty
+                if child_cost < best.get(child_key, float("inf")):
+                    best[child_key] = child_cost
+                    heapq.heappush(frontier, (
+                        child_cost + heuristic(child), next(counter), child_cost, child_key, actions + [action]
+                    ))
+
+    # Killing every process always ends in a safe state, so this is unreachable
+    raise RuntimeError("No recovery sequence found")
+
+
+class PlanPolicy:
+    """Replays a fixed action plan through the ``predict`` interface, then does nothing."""
+
+    def __init__(self, actions):
+        self.actions = list(actions)
+        self.position = 0
+
+    def predict(self, obs, deterministic=True):
+        if self.position < len(self.actions):
+            action = self.actions[self.position]
+            self.position += 1
+            return action, None
+        return 0, None
@@ -0,0 +1,73 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def model_version(path):
+    """Short content hash of a saved model, so retrained weights never reuse old entries."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def state_key(version, allocation, request, available):
+    """Hashes an (allocation, request, available) state for the given model version."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(version.encode("utf-8"))
+    for arr in (allocation, request, available):
+        digest.update(repr(arr.shape).encode("ascii"))
+        digest.update(arr.astype("<i8", copy=False).tobytes())
+    return digest.digest()
+
+
+class RolloutMemo:
+    """
+    Bounded LRU memo of state -> (action, deadlocked) for recovery rollouts.
+
+    A hit skips both the policy forward pass and the safety check. With a
+    stochastic policy, the action sampled the first time a state is seen is
+    replayed until the entry is evicted.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, action, deadlocked):
+        with self.lock:
+            self.entries[key] = (action, deadlocked)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
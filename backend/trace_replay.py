@@ -0,0 +1,383 @@
+import argparse
+import time
+import numpy as np
+import fast_json
+from binary_input import validate_arrays
+from matrix import analyze_safety
+from rag_wfg import run_deadlock_detection
+
+# A trace is JSON lines: a header with the system size and starting state,
+#   {"processes": 3, "available": [2, 1], "allocation": [[...]], "request": [[...]]}
+# (allocation and request default to zeros), then one event per line:
+#   {"op": "request", "process": 0, "resource": 1, "amount": 1}
+# amount defaults to 1. Ops:
+#   request  the process asks for more units
+#   grant    units move from available to the process, satisfying its request
+#   release  the process gives units back to available
+#   cancel   the process withdraws (part of) its request
+OPS = ("request", "grant", "release", "cancel")
+REQUEST, GRANT, RELEASE, CANCEL = range(len(OPS))
+OP_CODES = {name: code for code, name in enumerate(OPS)}
+
+METHODS = ("matrix", "wfg")
+
+# Detection runs at least this often, in events
+DEFAULT_CHECK_EVERY = 10000
+
+
+class TraceState:
+    """
+    Allocation, request and available, updated one event at a time.
+
+    Cells are plain Python ints so a single update is cheap; ``arrays()``
+    builds the NumPy view a detector needs. Alongside the cells it counts,
+    per process, the resources it is waiting for and, per resource, the
+    holders and requesters and how many holders are themselves waiting.
+    That is enough for ``apply`` to tell whether an event added a wait-for
+    edge that could close a cycle, without building the graph: a new edge
+    P -> Q only matters if Q is waiting for someone too.
+    """
+
+    def __init__(self, available, allocation, request):
+        available, allocation, request = validate_arrays(available, allocation, request)
+        self.available = available.tolist()
+        self.allocation = allocation.tolist()
+        self.request = request.tolist()
+        self.num_processes, self.num_resources = allocation.shape
+        held = allocation > 0
+        self.waiting = (request > 0).sum(axis=1).tolist()
+        self.holders = held.sum(axis=0).tolist()
+        self.requesters = (request > 0).sum(axis=0).tolist()
+        self.waiting_holders = held[np.array(self.waiting) > 0].sum(axis=0).tolist()
+        self.order = None  # Safe order from set_safe_order, kept up to date by still_safe
+
+    def arrays(self):
+        """Returns (available, allocation, request) as NumPy arrays."""
+        return np.array(self.available), np.array(self.allocation), np.array(self.request)
+
+    def set_safe_order(self, sequence):
+        """
+        Remembers a safe finish order of the current state (every process,
+        in order) and the work each process sees when its turn comes.
+        """
+        ordered = np.array(self.allocation, dtype=np.int64).reshape(self.num_processes, -1)[sequence]
+        work = np.array(self.available, dtype=np.int64) + np.cumsum(ordered, axis=0) - ordered
+        self.order = list(sequence)
+        self.work_before = work.tolist()
+        self.position = [0] * self.num_processes
+        for i, process in enumerate(sequence):
+            self.position[process] = i
+
+    def still_safe(self, op, process, resource, amount):
+        """
+        Keeps the remembered safe order up to date with an event just applied,
+        and tells whether it still proves the state safe.
+
+        Units granted to a process are missing from the work of every process
+        up to it in the order and come back once it finishes; units released
+        add to the work up to the releasing process. Only the touched cell's
+        requests can stop fitting, so checking them is O(position), not a
+        full safety check. Once this returns False the order is stale until
+        the next set_safe_order.
+        """
+        if self.order is None:
+            return False
+        position = self.position[process]
+        if op == REQUEST:
+            if self.request[process][resource] <= self.work_before[position][resource]:
+                return True
+            return self._move_to_end(process)
+        if op == RELEASE:
+            for work in self.work_before[:position + 1]:
+                work[resource] += amount
+            return True
+        if op == GRANT:
+            for q, work in zip(self.order[:position + 1], self.work_before):
+                work[resource] -= amount
+                if self.request[q][resource] > work[resource]:
+                    self.order = None
+                    return False
+        return True
+
+    def _move_to_end(self, process):
+        """
+        Moves a process to the end of the safe order if the order still fits:
+        it then sees everyone else's units, and the processes after its old
+        position lose only the units it holds.
+        """
+        position = self.position[process]
+        if position == len(self.order) - 1:
+            return False
+        held = [(s, units) for s, units in enumerate(self.allocation[process]) if units]
+        later = self.work_before[position + 1:]
+        for q, work in zip(self.order[position + 1:], later):
+            if any(self.request[q][s] > work[s] - units for s, units in held):
+                return False
+        last = self.order[-1]
+        end = [w + a - own for w, a, own in zip(later[-1], self.allocation[last], self.allocation[process])]
+        if any(r > w for r, w in zip(self.request[process], end)):
+            return False
+
+        for work in later:
+            for s, units in held:
+                work[s] -= units
+        del self.order[position], self.work_before[position]
+        self.order.append(process)
+        self.work_before.append(end)
+        for i in range(position, len(self.order)):
+            self.position[self.order[i]] = i
+        return True
+
+    def _set_request(self, process, resource, value):
+        row = self.request[process]
+        old = row[resource]
+        row[resource] = value
+        if bool(old) == bool(value):
+            return
+        step = 1 if value else -1
+        self.requesters[resource] += step
+        self.waiting[process] += step
+        if self.waiting[process] == (1 if value else 0):
+            # The process started or stopped waiting: update every resource it holds
+            for s, units in enumerate(self.allocation[process]):
+                if units:
+                    self.waiting_holders[s] += step
+
+    def _set_allocation(self, process, resource, value):
+        row = self.allocation[process]
+        old = row[resource]
+        row[resource] = value
+        if bool(old) == bool(value):
+            return
+        step = 1 if value else -1
+        self.holders[resource] += step
+        if self.waiting[process]:
+            self.waiting_holders[resource] += step
+
+    def apply(self, op, process, resource, amount):
+        """
+        Applies one event.
+
+        Returns:
+            bool: True if the event added a wait-for edge that could close a cycle
+        """
+        if not (0 <= process < self.num_processes and 0 <= resource < self.num_resources):
+            raise ValueError(f"No cell P{process}/R{resource}")
+        if amount < 0:
+            raise ValueError("amount cannot be negative")
+        requested = self.request[process][resource]
+        held = self.allocation[process][resource]
+
+        if op == REQUEST:
+            self._set_request(process, resource, requested + amount)
+            # New edges to the other holders of the resource; one of them must be waiting too
+            return not requested and amount > 0 and self.waiting_holders[resource] > (held > 0)
+
+        if op == GRANT:
+            if amount > self.available[resource]:
+                raise ValueError(f"Grant of {amount} R{resource} exceeds available {self.available[resource]}")
+            self.available[resource] -= amount
+            self._set_request(process, resource, max(0, requested - amount))
+            self._set_allocation(process, resource, held + amount)
+            # New edges from the other requesters of the resource; this process must be waiting too
+            others = self.requesters[resource] - (self.request[process][resource] > 0)
+            return not held and amount > 0 and others > 0 and self.waiting[process] > 0
+
+        if op == RELEASE:
+            if amount > held:
+                raise ValueError(f"Release of {amount} R{resource} exceeds P{process}'s allocation {held}")
+            self.available[resource] += amount
+            self._set_allocation(process, resource, held - amount)
+            return False
+
+        if op == CANCEL:
+            self._set_request(process, resource, max(0, requested - amount))
+            return False
+
+        raise ValueError(f"Unknown op: {op}")
+
+
+def detect(state, method, keep_order=False):
+    """
+    Runs a detector on the current state.
+
+    Args:
+        state: TraceState to check
+        method: "matrix" or "wfg"
+        keep_order: For "matrix", remember the safe order of a clean state
+            on it (see TraceState.set_safe_order)
+
+    Returns:
+        tuple: (deadlocked, processes involved), the processes being the
+        WFG cycle or the processes that can never finish
+    """
+    available, allocation, request = state.arrays()
+    if method == "wfg":
+        deadlocked, cycle_nodes, _ = run_deadlock_detection(
+            available, allocation, request, save_history=False, validate=False
+        )
+        return deadlocked, sorted(cycle_nodes)
+    report = analyze_safety(available, allocation, request, save_history=False, validate=False)
+    if not report["deadlocked"]:
+        if keep_order:
+            state.set_safe_order(report["safe_sequence"])
+        return False, []
+    return True, [f"P{b['process']}" for b in report["blocked"]]
+
+
+def read_trace(path):
+    """
+    Opens a trace file.
+
+    Returns:
+        tuple: (TraceState from the header, iterator of (op, process, resource, amount))
+    """
+    f = open(path, "rb")
+    header = fast_json.loads(f.readline())
+    available = header["available"]
+    shape = (header["processes"], len(available))
+    state = TraceState(
+        available,
+        header.get("allocation") or np.zeros(shape, dtype=np.int64),
+        header.get("request") or np.zeros(shape, dtype=np.int64)
+    )
+
+    def events():
+        with f:
+            for line in f:
+                if not line.strip():
+                    continue
+                event = fast_json.loads(line)
+                try:
+                    op = OP_CODES[event["op"]]
+                except KeyError:
+                    raise ValueError(f"Unknown op: {event.get('op')}")
+                yield op, event["process"], event["resource"], event.get("amount", 1)
+
+    return state, events()
+
+
+def replay(path, method="matrix", check_every=DEFAULT_CHECK_EVERY, on_wfg_change=True):
+    """
+    Streams a trace and finds the first event after which the system is deadlocked.
+
+    Detection runs every ``check_every`` events and, with ``on_wfg_change``,
+    after any event that can newly deadlock the system: for "wfg", one that
+    adds a wait-for edge that could close a cycle; for "matrix", a request
+    or grant after which the safe order found by the last check no longer
+    fits (see TraceState.still_safe). While that order fits, the state is
+    safe, so with the trigger on the result is exact. Without it, when a
+    check finds a deadlock, the events since the last clean check are
+    replayed one at a time from that state, so the reported index is the
+    first deadlocked event after that check; a deadlock that clears again
+    between two checks is missed.
+
+    Args:
+        path: Trace file (see the format above)
+        method: "matrix" (safety algorithm) or "wfg" (wait-for cycle)
+        check_every: Events between periodic checks; 0 only checks on triggering events
+        on_wfg_change: Also check after events that can newly deadlock the system
+
+    Returns:
+        dict: ``events`` read, ``deadlock_event`` (0-based index of the first
+        deadlocking event, -1 if the header state is already deadlocked, or
+        None), ``processes`` involved, ``checks`` run, ``seconds`` and
+        ``events_per_minute``
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    start = time.perf_counter()
+    state, events = read_trace(path)
+    checks = 0
+
+    def check(current, keep_order=False):
+        nonlocal checks
+        checks += 1
+        return detect(current, method, keep_order)
+
+    deadlock_event = None
+    processes = []
+    clean = state.arrays()  # State at the last clean check
+    pending = []            # Events since then
+    index = -1
+
+    def narrow(last):
+        """First deadlocked event in ``pending``, which ends at event ``last``."""
+        first = last - len(pending) + 1
+        replayed = TraceState(*clean)
+        for offset, event in enumerate(pending[:-1]):
+            replayed.apply(*event)
+            deadlocked, found = check(replayed)
+            if deadlocked:
+                return first + offset, found
+        return last, processes
+
+    deadlocked, processes = check(state, keep_order=on_wfg_change)
+    if deadlocked:
+        deadlock_event = -1  # Deadlocked before the first event
+    else:
+        for index, event in enumerate(events):
+            try:
+                edge_added = state.apply(*event)
+            except ValueError as e:
+                raise ValueError(f"Event {index}: {e}")
+            pending.append(event)
+
+            if method == "wfg":
+                triggered = edge_added
+            else:
+                triggered = on_wfg_change and not state.still_safe(*event)
+            due = check_every and len(pending) >= check_every
+            if not (due or (on_wfg_change and triggered)):
+                continue
+            deadlocked, processes = check(state, keep_order=on_wfg_change)
+            if not deadlocked:
+                clean = state.arrays()
+                pending = []
+                continue
+
+            if on_wfg_change:
+                deadlock_event = index  # No earlier event could have deadlocked the system
+            else:
+                deadlock_event, processes = narrow(index)
+            break
+        else:
+            # The end of the trace counts as a check
+            if pending:
+                deadlocked, processes = check(state)
+                if deadlocked:
+                    deadlock_event, processes = narrow(index)
+
+    elapsed = time.perf_counter() - start
+    events_read = index + 1
+    return {
+        "events": events_read,
+        "deadlock_event": deadlock_event,
+        "processes": processes,
+        "checks": checks,
+        "seconds": elapsed,
+        "events_per_minute": events_read / elapsed * 60 if elapsed else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a resource event trace and find the first deadlock")
+    parser.add_argument("trace", help="JSON-lines trace file")
+    parser.add_argument("--method", choices=METHODS, default="matrix")
+    parser.add_argument("--every", type=int, default=DEFAULT_CHECK_EVERY, help="Check every K events (0: never)")
+    parser.add_argument("--no-wfg-trigger", action="store_true", help="Do not check on events that can newly deadlock")
+    args = parser.parse_args()
+
+    result = replay(args.trace, args.method, args.every, on_wfg_change=not args.no_wfg_trigger)
+    if result["deadlock_event"] is None:
+        print(f"✅ No deadlock in {result['events']} events.")
+    elif result["deadlock_event"] < 0:
+        print(f"🔴 Deadlocked before the first event: {', '.join(result['processes'])}")
+    else:
+        print(f"🔴 Deadlock after event {result['deadlock_event']}: {', '.join(result['processes'])}")
+    print(f"{result['events']} events, {result['checks']} checks in {result['seconds']:.2f}s "
+          f"({result['events_per_minute']:,.0f} events/min)")
+
+
+if __name__ == "__main__":
+    main()
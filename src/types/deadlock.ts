@@ -35,6 +35,13 @@ export interface MatrixSimulationResponse {
     simulation_id: string;
     steps: MatrixSimulationStep[]; // Simulation steps for Matrix
   } | null;
+  safe_sequence: number[]; // Processes in the order they can finish
+  blocked: {
+    process: number;       // Process that can never finish
+    shortfall: number[];   // Missing units per resource (request - work)
+  }[];
+  extra_available: number[]; // Extra resources that would make the state safe
+  extra_available_exact: boolean; // extra_available is the smallest such vector, not just a sufficient one
 }
 
 // Response interface for Recovery simulation (RL-based)
@@ -48,6 +55,7 @@ export interface RecoverySimulationResponse {
   simulation_id: string;
   steps: RecoverySimulationStep[];
   response: string[]; // Raw textual output from backend render()
+  penalty?: number;   // Total penalty of the plan (strategy=optimal only)
 }
 
 // Main store interface defining state and actions